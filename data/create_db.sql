@@ -7,9 +7,15 @@ CREATE TABLE words (
     length INTEGER NOT NULL,
     language_code TEXT NOT NULL,
     position TEXT NOT NULL,
-    frequency REAL NULL
+    frequency REAL NULL,
+    -- Whether the word can be placed in a crossword, see src/eligibility.py
+    eligible INTEGER NOT NULL DEFAULT 0,
+    -- Sampling weight from the frequency and length
+    weight REAL NULL
 );
 
+CREATE INDEX words_language_code ON words (language_code);
+
 DROP TABLE IF EXISTS sources;
 
 CREATE TABLE sources (
@@ -29,6 +35,8 @@ CREATE TABLE definitions (
     FOREIGN KEY (source_id) REFERENCES sources (id)
 );
 
+CREATE INDEX definitions_word_id ON definitions (word_id);
+
 DROP TABLE IF EXISTS categories;
 
 CREATE TABLE categories (
@@ -56,6 +64,18 @@ CREATE TABLE translations (
     FOREIGN KEY (word_to_id) REFERENCES words (id)
 );
 
+-- Translations grouped by language pair, with the translated word, built at the end of the index build
+DROP TABLE IF EXISTS translation_pairs;
+
+CREATE TABLE translation_pairs (
+    lang_from TEXT NOT NULL,
+    lang_to TEXT NOT NULL,
+    word_id INTEGER NOT NULL,
+    translation_id INTEGER NOT NULL,
+    translation TEXT NOT NULL,
+    PRIMARY KEY (lang_from, lang_to, word_id, translation_id)
+) WITHOUT ROWID;
+
 DROP TABLE IF EXISTS synonyms;
 
 CREATE TABLE synonyms (
@@ -64,4 +84,12 @@ CREATE TABLE synonyms (
     PRIMARY KEY (word_id, synonym_id),
     FOREIGN KEY (word_id) REFERENCES words (id),
     FOREIGN KEY (synonym_id) REFERENCES words (id)
-);
\ No newline at end of file
+);
+
+-- Kept across index rebuilds, filled by the frequency task
+CREATE TABLE IF NOT EXISTS frequencies (
+    language_code TEXT NOT NULL,
+    word TEXT NOT NULL,
+    frequency REAL NOT NULL,
+    PRIMARY KEY (language_code, word)
+) WITHOUT ROWID;
@@ -0,0 +1,372 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import multiprocessing
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from invoke import task
+from loguru import logger
+import numpy as np
+
+from crossword import Crossword, CluesMode, CrosswordStyle, ThemeMode
+from metrics import Metrics
+from puzzle_pool import PuzzleKey, PuzzlePool, generate_key, init_worker
+from words import WordIndex
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+# A crossword request: its key, number of words, seed and time budget
+Request = Tuple[PuzzleKey, int, int, float]
+
+
+def step_to_dict(step: dict) -> dict:
+    return {
+        "position": list(step["position"]),
+        "direction": step["direction"].name.lower(),
+        "word": str(step["word"]),
+    }
+
+
+def random_seed() -> int:
+    """Fresh seed from OS entropy, for requests without a seed"""
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def _generate(request: Request, steps=None) -> Crossword:
+    key, n_words, seed, time_budget = request
+    # Clues are resolved by the server threads, the workers only place words
+    return generate_key(
+        key,
+        n_words,
+        time_budget=time_budget,
+        seed=seed,
+        on_step=None if steps is None else lambda step: steps.put(step_to_dict(step)),
+        fetch_clues=False,
+    )
+
+
+def _generate_steps(request: Request, steps) -> Crossword:
+    try:
+        return _generate(request, steps)
+    finally:
+        # Tells the streaming request that the generation is over
+        steps.put(None)
+
+
+def parse_request(params: Dict[str, str], time_budget: float = None) -> Request:
+    """Reads the crossword parameters of a query string
+
+    Raises:
+        ValueError: When a parameter is missing or invalid
+    """
+    if "lang_from" not in params:
+        raise ValueError("lang_from is required")
+
+    try:
+        shape = tuple(int(size) for size in params.get("shape", "8x8").split("x"))
+        key = PuzzleKey(
+            shape,
+            params["lang_from"],
+            params.get("lang_to"),
+            CluesMode[params.get("clues_mode", "definition").upper()],
+            CrosswordStyle[params.get("style", "american").upper()],
+            params.get("theme"),
+            ThemeMode[params.get("theme_mode", "word2vec").upper()],
+        )
+    except KeyError as error:
+        raise ValueError(f"Unknown value {error}") from error
+    if len(shape) != 2:
+        raise ValueError(f"Invalid shape {params['shape']}")
+
+    n_words = int(params.get("n_words", 12))
+    seed = int(params["seed"]) if "seed" in params else None
+    if "time_budget" in params:
+        time_budget = float(params["time_budget"])
+
+    return key, n_words, seed, time_budget
+
+
+class CrosswordServer:
+    """Asyncio HTTP API generating crosswords
+
+    Endpoints (GET, parameters in the query string):
+        /crossword: Crossword as JSON, identical in-flight requests with a seed share one generation
+        /crossword/steps: Placements as newline delimited JSON as they happen, then the crossword
+        /stats: Request counters, clue cache and puzzle pool statistics
+        /health: Liveness check
+
+    Crossword parameters are `shape` (e.g. 8x8), `lang_from`, `lang_to`, `n_words`, `clues_mode`,
+    `style`, `theme`, `theme_mode`, `seed` and `time_budget`.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/words.db",
+        languages: List[str] = None,
+        processes: int = None,
+        threads: int = 4,
+        word2vec_models: Dict[str, str] = None,
+        pool: PuzzlePool = None,
+        time_budget: float = None,
+    ) -> None:
+        """
+        Args:
+            db_path (str, optional): Path of the word index. Defaults to "data/words.db".
+            languages (List[str], optional): Languages loaded by the generation processes. Defaults to all languages.
+            processes (int, optional): Number of generation processes. Defaults to the number of CPUs.
+            threads (int, optional): Number of clue resolution threads and read-only SQLite connections. Defaults to 4.
+            word2vec_models (Dict[str, str], optional): Word2Vec model path per language used for themes. Defaults to WORD2VEC_MODELS.
+            pool (PuzzlePool, optional): Pre-generated puzzles served to requests without a seed or time budget asking for the pool's number of words. Defaults to None.
+            time_budget (float, optional): Default seconds allowed to a generation. Defaults to no limit.
+        """
+        # Clues of the generated crosswords are resolved by this process' word index
+        self.word_index = WordIndex(db_path, connections=threads)
+        self.processes = ProcessPoolExecutor(
+            processes or multiprocessing.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(db_path, languages, word2vec_models),
+        )
+        self.threads = ThreadPoolExecutor(threads, thread_name_prefix="clues")
+        self.manager = None
+        self.pool = pool
+        self.time_budget = time_budget
+        self.in_flight = {}
+        self.metrics = Metrics()
+        self.server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        """Starts listening, port 0 picks a free port"""
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+        self.processes.shutdown(cancel_futures=True)
+        self.threads.shutdown()
+        if self.manager is not None:
+            self.manager.shutdown()
+
+    async def crossword(self, request: Request) -> dict:
+        """Generates a crossword, or joins the generation of an identical in-flight request with a seed"""
+        if request[2] is None:
+            # Requests without a seed each get a puzzle of their own
+            return await self.__crossword(request)
+
+        future = self.in_flight.get(request)
+        if future is None:
+            future = asyncio.ensure_future(self.__crossword(request))
+            self.in_flight[request] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(request, None))
+        else:
+            self.metrics.count("coalesced")
+
+        # A cancelled client must not cancel the generation shared with the others
+        return await asyncio.shield(future)
+
+    async def __crossword(self, request: Request) -> dict:
+        loop = asyncio.get_running_loop()
+        key, n_words, seed, time_budget = request
+        # Pooled puzzles only answer requests with the pool's number of words and no time budget of their own
+        if (
+            self.pool is not None
+            and seed is None
+            and n_words == self.pool.n_words
+            and time_budget == self.time_budget
+        ):
+            puzzle = await loop.run_in_executor(self.threads, self.pool.get, key)
+            if puzzle is not None:
+                self.metrics.count("pool_hits")
+                return puzzle
+
+        if seed is None:
+            request = (key, n_words, random_seed(), time_budget)
+        self.metrics.count("generations")
+        with self.metrics.time("generation"):
+            crossword = await loop.run_in_executor(self.processes, _generate, request)
+        with self.metrics.time("clues"):
+            await loop.run_in_executor(self.threads, crossword.fetch_clues)
+        return crossword.to_dict()
+
+    async def stream_steps(self, request: Request):
+        """Yields the placements of a new generation as they happen, then `{"crossword": ...}`"""
+        loop = asyncio.get_running_loop()
+        if self.manager is None:
+            self.manager = multiprocessing.get_context("spawn").Manager()
+        steps = self.manager.Queue()
+        if request[2] is None:
+            request = (request[0], request[1], random_seed(), request[3])
+
+        self.metrics.count("generations")
+        future = loop.run_in_executor(self.processes, _generate_steps, request, steps)
+        # Waiting on the queue blocks a thread, keep the clue threads free
+        while (step := await asyncio.to_thread(steps.get)) is not None:
+            yield step
+
+        crossword = await future
+        await loop.run_in_executor(self.threads, crossword.fetch_clues)
+        yield {"crossword": crossword.to_dict()}
+
+    def stats(self) -> dict:
+        stats = {
+            **self.metrics.to_dict(),
+            "in_flight": len(self.in_flight),
+            "clue_cache": self.word_index.clue_cache.stats(),
+        }
+        if self.pool is not None:
+            stats["pool"] = self.pool.stats()
+        return stats
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            # Headers are not used
+            while await reader.readline() not in (b"\r\n", b"\n", b""):
+                pass
+
+            self.metrics.count("requests")
+            url = urlsplit(target)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            if method != "GET":
+                await self.__respond(writer, 405, {"error": f"Unsupported method {method}"})
+            elif url.path == "/crossword":
+                request = parse_request(params, self.time_budget)
+                await self.__respond(writer, 200, await self.crossword(request))
+            elif url.path == "/crossword/steps":
+                request = parse_request(params, self.time_budget)
+                await self.__stream(writer, self.stream_steps(request))
+            elif url.path == "/stats":
+                await self.__respond(writer, 200, self.stats())
+            elif url.path == "/health":
+                await self.__respond(writer, 200, {"status": "ok"})
+            else:
+                await self.__respond(writer, 404, {"error": f"Unknown path {url.path}"})
+        except ValueError as error:
+            self.metrics.count("bad_requests")
+            await self.__respond(writer, 400, {"error": str(error)})
+        except ConnectionError:
+            pass
+        except Exception as error:
+            self.metrics.count("errors")
+            logger.exception(error)
+            await self.__respond(writer, 500, {"error": str(error)})
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __respond(writer: asyncio.StreamWriter, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1")
+            + data
+        )
+        await writer.drain()
+
+    @staticmethod
+    async def __stream(writer: asyncio.StreamWriter, lines) -> None:
+        writer.write(
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/x-ndjson\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1")
+        )
+        try:
+            async for line in lines:
+                data = json.dumps(line).encode("utf-8") + b"\n"
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception as error:
+            # The status is already sent, the error ends the stream
+            logger.exception(error)
+            data = json.dumps({"error": str(error)}).encode("utf-8") + b"\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def http_get(host: str, port: int, path: str) -> Tuple[int, bytes]:
+    """Minimal HTTP client of the API used by the tests and benchmarks
+
+    Returns:
+        Tuple[int, bytes]: Status code and body of the response, chunks joined
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if b"transfer-encoding: chunked" in head.lower():
+        chunks = []
+        while True:
+            size, _, body = body.partition(b"\r\n")
+            size = int(size, 16)
+            if size == 0:
+                break
+            chunks.append(body[:size])
+            body = body[size + 2:]
+        body = b"".join(chunks)
+
+    return status, body
+
+
+@task
+def serve(
+    ctx,
+    host="127.0.0.1",
+    port=8080,
+    db_path="data/words.db",
+    languages="",
+    processes=0,
+    threads=4,
+    time_budget=0.0,
+):
+    """Runs the crossword API
+
+    Args:
+        host (str, optional): Interface to listen on. Defaults to "127.0.0.1".
+        port (int, optional): Port to listen on. Defaults to 8080.
+        db_path (str, optional): Path of the word index. Defaults to "data/words.db".
+        languages (str, optional): Comma separated languages to serve. Defaults to all languages.
+        processes (int, optional): Number of generation processes. Defaults to the number of CPUs.
+        threads (int, optional): Number of clue resolution threads. Defaults to 4.
+        time_budget (float, optional): Default seconds allowed to a generation. Defaults to no limit.
+    """
+
+    async def run():
+        server = CrosswordServer(
+            db_path,
+            languages.split(",") if languages else None,
+            processes or None,
+            threads,
+            time_budget=time_budget or None,
+        )
+        try:
+            async with await server.start(host, port) as listener:
+                logger.info(f"Serving crosswords on http://{host}:{port}")
+                await listener.serve_forever()
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,451 @@
+import asyncio
+from collections import Counter
+from itertools import product
+import json
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from invoke import task
+from invoke.exceptions import Exit
+from tabulate import tabulate
+
+import data_processing
+from synthetic import generate_sentences, generate_wiktextract, synthetic_vocabulary
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+GENERATION_BASELINE = "benchmarks/generation_baseline.json"
+
+# Modules loaded by generation workers and invoke commands
+STARTUP_MODULES = ["word_grid", "words", "crossword", "data_processing", "api"]
+
+INDEX_TABLES = [
+    "frequencies",
+    "words",
+    "definitions",
+    "categories",
+    "word_categories",
+    "synonyms",
+    "translations",
+    "translation_pairs",
+]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB, None when unavailable"""
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def count_rows(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    total = 0
+    for table in INDEX_TABLES:
+        total += conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return total
+
+
+def benchmark_phase(phase, data_dir: str, records: int) -> Dict[str, float]:
+    db_path = os.path.join(data_dir, "words.db")
+    rows_before = count_rows(db_path)
+    start = time.perf_counter()
+    phase(data_dir)
+    elapsed = time.perf_counter() - start
+    rows = count_rows(db_path) - rows_before
+
+    return {
+        "phase": phase.__name__,
+        "seconds": elapsed,
+        "records/s": records / elapsed,
+        "rows": rows,
+        "rows/s": rows / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+@task
+def benchmark_index(
+    ctx,
+    words=10000,
+    languages="en,de,fr,es",
+    senses=2,
+    translations=2,
+    synonyms=1,
+    categories=2,
+    seed=0,
+):
+    """Times each phase of the word index build on synthetic wiktextract data
+
+    Args:
+        words (int, optional): Number of words per language. Defaults to 10000.
+        languages (str, optional): Comma separated language codes. Defaults to "en,de,fr,es".
+        senses (int, optional): Senses per word. Defaults to 2.
+        translations (int, optional): Translations per word and target language. Defaults to 2.
+        synonyms (int, optional): Synonyms per word. Defaults to 1.
+        categories (int, optional): Categories per word. Defaults to 2.
+        seed (int, optional): Random seed of the fixtures. Defaults to 0.
+    """
+    with tempfile.TemporaryDirectory() as data_dir:
+        records = generate_wiktextract(
+            data_dir,
+            words,
+            languages.split(","),
+            n_senses=senses,
+            n_translations=translations,
+            n_synonyms=synonyms,
+            n_categories=categories,
+            seed=seed,
+        )
+        data_processing.create_database(data_dir)
+        n_records = sum(records.values())
+
+        results = [benchmark_phase(data_processing.extract_frequencies, data_dir, n_records)]
+        for phase in data_processing.INDEX_PHASES:
+            results.append(benchmark_phase(phase, data_dir, n_records))
+
+    print(tabulate(results, headers="keys", floatfmt=".2f"))
+
+
+def build_synthetic_index(
+    data_dir: str, n_words: int, languages: List[str], themed: bool, seed: int = 0
+) -> Dict[str, Dict[str, str]]:
+    """Builds a synthetic word index and, for themed runs, its Word2Vec models
+
+    Returns:
+        Dict[str, Dict[str, str]]: Model path, theme word and theme category per language, empty when not themed
+    """
+    generate_wiktextract(data_dir, n_words, languages, seed=seed)
+    data_processing.create_database(data_dir)
+    data_processing.extract_frequencies(data_dir)
+    for phase in data_processing.INDEX_PHASES:
+        phase(data_dir)
+
+    themes = {}
+    if themed:
+        n_topics = 20
+        for lang_code in languages:
+            filename = generate_sentences(data_dir, lang_code, n_words, n_words * 2, n_topics, seed)
+            model_path = data_processing.train_language_model(filename, stop_words=set())
+            vocabulary = synthetic_vocabulary(lang_code, n_words, seed)
+            theme = next(word for word, _ in vocabulary[::n_topics] if word.isalpha())
+            themes[lang_code] = {"model": model_path, "theme": theme, "category": "Topic 0"}
+
+    return themes
+
+
+def run_generation_configs(
+    db_path: str, configs: List[dict], repeats: int, themes: Dict[str, Dict[str, str]]
+) -> List[dict]:
+    """Runs the generation benchmark configs against a word index, meant to run in a fresh process"""
+    from loguru import logger
+
+    from crossword import CrosswordGenerator, ThemeMode
+    from words import WordIndex
+
+    logger.remove()
+    languages = sorted({config["lang_from"] for config in configs} | {config["lang_to"] for config in configs if config["lang_to"]})
+    word_index = WordIndex(db_path).get_data(languages, eligible_only=True)
+    word2vec_models = {lang_code: theme["model"] for lang_code, theme in themes.items()}
+
+    results = []
+    for config in configs:
+        lang_code = config["lang_to"] or config["lang_from"]
+        theme_mode = ThemeMode[config["theme"].upper()] if config["theme"] else ThemeMode.WORD2VEC
+        if config["theme"] == "word2vec":
+            theme = themes[lang_code]["theme"]
+        elif config["theme"] == "category":
+            theme = themes[lang_code]["category"]
+        else:
+            theme = None
+
+        start = time.perf_counter()
+        generator = CrosswordGenerator(word_index, config["style"], 0, word2vec_models)
+        setup_seconds = time.perf_counter() - start
+
+        n_placed = 0
+        fill_ratios = []
+        tier_hits = Counter()
+        start = time.perf_counter()
+        for seed in range(repeats):
+            crossword = generator.generate(
+                config["shape"],
+                config["lang_from"],
+                config["n_words"],
+                lang_to=config["lang_to"],
+                theme=theme,
+                theme_mode=theme_mode,
+                clues_mode=config["clues_mode"],
+                seed=seed,
+                collect_metrics=True,
+            )
+            n_placed += len(crossword.words)
+            tier_hits.update({name: count for name, count in crossword.metrics.counters.items() if name.startswith("tier_")})
+            fill_ratios.append(float((crossword.word_grid.state != 0).mean()))
+        elapsed = time.perf_counter() - start
+
+        results.append(
+            {
+                "key": config["key"],
+                "setup_s": setup_seconds,
+                "puzzles/s": repeats / elapsed,
+                "ms/word": elapsed * 1000 / max(n_placed, 1),
+                "words": n_placed / repeats,
+                "fill_ratio": sum(fill_ratios) / repeats,
+                # Placements found in the heaviest dictionary tier
+                "top_tier": tier_hits["tier_0_hits"] / max(sum(tier_hits.values()), 1),
+                "peak_rss_mb": peak_rss_mb(),
+            }
+        )
+
+    return results
+
+
+@task
+def benchmark_generation(
+    ctx,
+    sizes="10000",
+    shapes="8x8,12x16",
+    n_words=12,
+    repeats=3,
+    lang_from="en",
+    lang_to="de",
+    themed=True,
+    output="",
+    baseline=GENERATION_BASELINE,
+    save_baseline=False,
+    tolerance=0.1,
+):
+    """Benchmarks crossword generation on synthetic dictionaries
+
+    Every combination of dictionary size, grid shape, crossword style, clues mode and
+    unthemed/Word2Vec themed/category themed dictionary is measured, translation clues use `lang_to` words.
+
+    Args:
+        sizes (str, optional): Comma separated words per language. Defaults to "10000".
+        shapes (str, optional): Comma separated grid shapes. Defaults to "8x8,12x16".
+        n_words (int, optional): Words to place per puzzle. Defaults to 12.
+        repeats (int, optional): Puzzles generated per configuration. Defaults to 3.
+        lang_from (str, optional): Language of the clues. Defaults to "en".
+        lang_to (str, optional): Language of the words in translation mode. Defaults to "de".
+        themed (bool, optional): Also benchmark Word2Vec and category themed dictionaries. Defaults to True.
+        output (str, optional): Path of the JSON results. Defaults to not writing them.
+        baseline (str, optional): Path of the baseline results. Defaults to GENERATION_BASELINE.
+        save_baseline (bool, optional): Store the results as the new baseline. Defaults to False.
+        tolerance (float, optional): Allowed puzzles/s slowdown against the baseline. Defaults to 0.1.
+    """
+    from crossword import CluesMode, CrosswordStyle
+
+    results = []
+    # Each dictionary size runs in a fresh process to isolate its memory usage
+    mp_context = multiprocessing.get_context("spawn")
+    for size in map(int, sizes.split(",")):
+        configs = []
+        for shape, style, clues_mode, theme in product(
+            shapes.split(","), CrosswordStyle, CluesMode, [None, "word2vec", "category"] if themed else [None]
+        ):
+            config_lang_to = lang_to if clues_mode == CluesMode.TRANSLATION else None
+            configs.append(
+                {
+                    "key": f"{size}/{shape}/{style.name.lower()}/{clues_mode.name.lower()}/{theme or 'all'}",
+                    "shape": tuple(map(int, shape.split("x"))),
+                    "style": style,
+                    "clues_mode": clues_mode,
+                    "lang_from": lang_from,
+                    "lang_to": config_lang_to,
+                    "n_words": n_words,
+                    "theme": theme,
+                }
+            )
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            themes = build_synthetic_index(data_dir, size, [lang_from, lang_to], themed)
+            with mp_context.Pool(1) as pool:
+                results += pool.apply(
+                    run_generation_configs,
+                    (os.path.join(data_dir, "words.db"), configs, repeats, themes),
+                )
+
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    regressions = []
+    if os.path.exists(baseline) and not save_baseline:
+        with open(baseline, "r", encoding="utf-8") as file:
+            baseline_results = {result["key"]: result for result in json.load(file)}
+
+        for result in results:
+            if result["key"] not in baseline_results:
+                continue
+            ratio = result["puzzles/s"] / baseline_results[result["key"]]["puzzles/s"]
+            result["vs_baseline"] = ratio
+            if ratio < 1 - tolerance:
+                regressions.append(result["key"])
+
+    print(tabulate(results, headers="keys", floatfmt=".3f"))
+
+    if save_baseline:
+        os.makedirs(os.path.dirname(baseline) or ".", exist_ok=True)
+        with open(baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if regressions:
+        raise Exit(f"Generation regressions against {baseline}: {', '.join(regressions)}", code=1)
+
+
+async def run_api_load(db_path: str, languages: List[str], paths: List[str], concurrency: int, processes: int, threads: int) -> dict:
+    """Sends the requests to an in-process API server with `concurrency` clients"""
+    from api import CrosswordServer, http_get
+
+    server = CrosswordServer(db_path, languages, processes, threads)
+    listener = await server.start("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    # Starts the generation processes before measuring
+    await http_get("127.0.0.1", port, paths[0])
+
+    queue = list(reversed(paths))
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        while queue:
+            path = queue.pop()
+            start = time.perf_counter()
+            status, _ = await http_get("127.0.0.1", port, path)
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    counters = server.metrics.counters
+    server.close()
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(paths),
+        "requests/s": len(paths) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "generations": counters["generations"] - 1,
+        "coalesced": counters["coalesced"],
+        "errors": errors,
+    }
+
+
+@task
+def benchmark_api(
+    ctx,
+    size=10000,
+    requests=200,
+    concurrency="1,8,32",
+    distinct=20,
+    shape="8x8",
+    n_words=12,
+    lang_from="en",
+    lang_to="de",
+    processes=0,
+    threads=4,
+):
+    """Measures the API throughput and latency under concurrent load on a synthetic dictionary
+
+    Consecutive requests share one of `distinct` seeds, odd seeds use translation clues, so
+    concurrent identical requests exercise the coalescing.
+
+    Args:
+        size (int, optional): Words per language. Defaults to 10000.
+        requests (int, optional): Requests per concurrency level. Defaults to 200.
+        concurrency (str, optional): Comma separated numbers of concurrent clients. Defaults to "1,8,32".
+        distinct (int, optional): Number of distinct requests. Defaults to 20.
+        shape (str, optional): Grid shape. Defaults to "8x8".
+        n_words (int, optional): Words to place per puzzle. Defaults to 12.
+        lang_from (str, optional): Language of the clues. Defaults to "en".
+        lang_to (str, optional): Language of the words in translation mode. Defaults to "de".
+        processes (int, optional): Number of generation processes. Defaults to the number of CPUs.
+        threads (int, optional): Number of clue resolution threads. Defaults to 4.
+    """
+    paths = []
+    for i in range(requests):
+        # Consecutive requests share their seed so that concurrent clients send identical requests
+        seed = i * distinct // requests
+        mode = f"clues_mode=translation&lang_to={lang_to}" if seed % 2 else "clues_mode=definition"
+        paths.append(f"/crossword?shape={shape}&lang_from={lang_from}&n_words={n_words}&seed={seed}&{mode}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        build_synthetic_index(data_dir, size, [lang_from, lang_to], themed=False)
+        db_path = os.path.join(data_dir, "words.db")
+        for clients in map(int, concurrency.split(",")):
+            results.append(
+                asyncio.run(
+                    run_api_load(db_path, [lang_from, lang_to], paths, clients, processes or None, threads)
+                )
+            )
+
+    print(tabulate(results, headers="keys", floatfmt=".2f"))
+
+
+def import_time(module: str) -> Dict[str, float]:
+    """Measures the import time of a module in a fresh interpreter
+
+    Returns:
+        Dict[str, float]: Wall time of the import and its slowest dependencies, in seconds
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([src_dir, os.environ.get("PYTHONPATH", "")]))
+    script = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    # -X importtime lines look like `import time: self [us] | cumulative | imported package`
+    packages = []
+    for line in process.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        if "." not in name and name != module:
+            packages.append((int(fields[1]) / 1e6, name))
+
+    return {
+        "module": module,
+        "seconds": float(process.stdout.strip()),
+        "slowest": ", ".join(f"{name} {seconds:.2f}s" for seconds, name in sorted(packages)[::-1][:3]),
+    }
+
+
+@task
+def benchmark_imports(ctx, modules=",".join(STARTUP_MODULES), budget=1.0):
+    """Checks the import time of the startup modules against a budget
+
+    Args:
+        modules (str, optional): Comma separated modules to import. Defaults to STARTUP_MODULES.
+        budget (float, optional): Maximum import time of each module in seconds. Defaults to 1.0.
+    """
+    results = [import_time(module) for module in modules.split(",")]
+    print(tabulate(results, headers="keys", floatfmt=".3f"))
+
+    over_budget = [result["module"] for result in results if result["seconds"] > budget]
+    if over_budget:
+        raise Exit(f"Import time over {budget}s: {', '.join(over_budget)}", code=1)
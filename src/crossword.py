@@ -1,21 +1,39 @@
 from copy import deepcopy
 from enum import Enum
 from itertools import product
-import random
 import sys
-from typing import Dict, List, Tuple
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple, Union
 
-from gensim.models import Word2Vec
 from loguru import logger
 import pandas as pd
 from pandas import DataFrame
 import numpy as np
 from tqdm import tqdm
 
+from eligibility import EXCLUDED_POSITIONS, INVALID_CHARACTERS, MIN_WORD_LEN
+from metrics import Metrics, NULL_METRICS
+from slot_scoring import SlotScorer
 from words import WordIndex, Word
 from word_grid import WordGrid, Direction, ValidationMode
 
-MIN_WORD_LEN = 3
+if TYPE_CHECKING:
+    from threading import Event
+
+    from gensim.models import Word2Vec
+
+    from templates import Template
+
+# Word2Vec models used for themes, trained by the `train` task
+WORD2VEC_MODELS = {
+    "de": "data/deu_wikipedia_2021_1M/word2vec.model",
+    "en": "data/eng_wikipedia_2016_1M/word2vec.model",
+    "es": "data/spa_wikipedia_2021_1M/word2vec.model",
+    "fr": "data/fra_wikipedia_2021_1M/word2vec.model",
+}
+
+# Words of each length in the dictionary tiers searched before the rest, by decreasing weight
+DICTIONARY_TIERS = (256, 4096)
 
 class CrosswordStyle(Enum):
     AMERICAN = 0
@@ -26,76 +44,240 @@ class CluesMode(Enum):
     SYNONYM = 1
     TRANSLATION = 2
 
+class ThemeMode(Enum):
+    WORD2VEC = 0
+    CATEGORY = 1
+    CATEGORY_PREFIX = 2
+
 
 class Crossword:
     """Represents a crossword puzzle"""
 
-    def __init__(self, word_grid: WordGrid, words: List[Word], lang_from: str, mode: CluesMode) -> None:
+    def __init__(
+        self,
+        word_grid: WordGrid,
+        words: List[Word],
+        lang_from: str,
+        mode: CluesMode,
+        metrics: Metrics = None,
+        truncated: bool = False,
+        rng: np.random.Generator = None,
+        fetch_clues: bool = True,
+    ) -> None:
         self.word_grid = word_grid
         self.words = words
         self.lang_from = lang_from
+        self.mode = mode
         self.clues = []
-        
-        fetch_translation = self.words[0].meta.language_code != self.lang_from
+        self.metrics = metrics
+        # Whether the generation stopped at its time budget before placing every word
+        self.truncated = truncated
+        # Picks a clue among the definitions, synonyms or translations of a word
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        if fetch_clues:
+            self.fetch_clues()
+
+    def fetch_clues(self) -> None:
+        """Picks a clue for each word, deferred by `fetch_clues=False` to resolve clues elsewhere"""
+        with (self.metrics or NULL_METRICS).time("clues"):
+            self.__fetch_clues(self.mode)
+
+    def __fetch_clues(self, mode: CluesMode) -> None:
+        self.clues = []
+        if not self.words:
+            return
+
+        fetch_translation = self.words[0].language_code != self.lang_from
         index = WordIndex()
+        if self.metrics is not None:
+            queries = index.queries
+
         for word in self.words:
             if fetch_translation:
-                trans_words = index.get_translation(word, self.lang_from)
-                word = random.choice(trans_words)
+                word = self.__choose(index.get_translation(word, self.lang_from))
+                if word is None:
+                    # generate only picks words with translations, other word lists may not
+                    self.clues.append(None)
+                    continue
 
             if mode == CluesMode.DEFINITION:
                 definitions = index.get_definition(word)
-                self.clues.append(random.choice(definitions))
+                self.clues.append(self.__choose(definitions))
             elif mode == CluesMode.TRANSLATION and fetch_translation:
                 self.clues.append(word)
             elif mode == CluesMode.SYNONYM:
                 synonyms = index.get_synonym(word)
-                self.clues.append(random.choice(synonyms))
-                
+                self.clues.append(self.__choose(synonyms))
+
+        if self.metrics is not None:
+            self.metrics.count("sql_queries", index.queries - queries)
+
+    def __choose(self, options: list):
+        if not options:
+            logger.debug("No clue found")
+            return None
+        return options[self.rng.integers(len(options))]
+
     def to_dict(self):
-        return {
+        data = {
             "word_grid": self.word_grid.puzzle.tolist(),
             "words": [str(word) for word in self.words],
-            "clues": self.clues
+            # Translation and synonym clues are `Word`s, kept as their text
+            "clues": [None if clue is None else str(clue) for clue in self.clues],
+            "truncated": self.truncated,
         }
+        if self.metrics is not None:
+            data["metrics"] = self.metrics.to_dict()
+
+        return data
  
 
 
+class StepRecording:
+    """Placements of a generation, stored as placed words and replayed into grids on demand
+
+    Each placed `Word` already holds its position, direction and id, recording a step
+    costs a list append instead of a copy of the grid.
+    """
+
+    def __init__(self, shape: Tuple[int, int], word_grid: WordGrid = None) -> None:
+        """
+        Args:
+            shape (Tuple[int, int]): Shape of the grid
+            word_grid (WordGrid, optional): Grid the generation started from, copied as the start of the replays. Defaults to an empty grid.
+        """
+        self.shape = tuple(shape)
+        self.words = []
+        self.puzzle = None if word_grid is None else word_grid.puzzle.copy()
+        self.state = None if word_grid is None else word_grid.state.copy()
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Tuple[dict, WordGrid], List[Tuple[dict, WordGrid]]]:
+        """Placement and grid of a step, like the former deep copied snapshots, a list of them for a slice"""
+        if isinstance(index, slice):
+            return list(zip(self.step(index), self.grid(index)))
+        return self.step(index), self.grid(index)
+
+    def __iter__(self):
+        """Yields the placement and grid of each step, the same grid is updated in place between steps"""
+        word_grid = self.__start()
+        for word in self.words:
+            word_grid.place_word(word.position, word.direction, word)
+            yield self.step_of(word), word_grid
+
+    def __start(self) -> WordGrid:
+        word_grid = WordGrid(self.shape)
+        if self.puzzle is not None:
+            word_grid.puzzle[:] = self.puzzle
+            word_grid.state[:] = self.state
+        return word_grid
+
+    def record(self, word: Word) -> None:
+        self.words.append(word)
+
+    @staticmethod
+    def step_of(word: Word) -> dict:
+        return {"position": word.position, "direction": word.direction, "word": word}
+
+    def step(self, index: Union[int, slice]) -> Union[dict, List[dict]]:
+        """Placement of a step, a list of placements for a slice"""
+        if isinstance(index, slice):
+            return [self.step_of(word) for word in self.words[index]]
+        return self.step_of(self.words[index])
+
+    def grid(self, index: Union[int, slice]) -> Union[WordGrid, List[WordGrid]]:
+        """Rebuilds the grid right after a step, negative indices count from the last step
+
+        Grids start from the grid of the generation, a slice gives a list of grids
+        rebuilt in a single replay.
+
+        Raises:
+            TypeError: When the index is neither an int nor a slice
+            IndexError: When the step does not exist
+        """
+        if isinstance(index, slice):
+            steps = range(len(self.words))[index]
+            word_grid, grids = self.__start(), {}
+            for step, word in enumerate(self.words[: max(steps, default=-1) + 1]):
+                word_grid.place_word(word.position, word.direction, word)
+                if step in steps:
+                    grids[step] = deepcopy(word_grid)
+            return [grids[step] for step in steps]
+        if not isinstance(index, (int, np.integer)):
+            raise TypeError(f"Step indices must be integers or slices, not {type(index).__name__}")
+
+        word_grid = self.__start()
+        for word in self.words[: range(len(self.words))[index] + 1]:
+            word_grid.place_word(word.position, word.direction, word)
+        return word_grid
+
+
 class CrosswordGenerator:
     """Crossword generator class"""
 
     def __init__(
-        self, word_index: DataFrame, style: CrosswordStyle, seed: int = 1
+        self,
+        word_index: DataFrame,
+        style: CrosswordStyle,
+        seed: int = 1,
+        word2vec_models: Dict[str, str] = None,
+        tier_sizes: Tuple[int, ...] = DICTIONARY_TIERS,
     ) -> None:
         """
         Args:
-            word_index (DataFrame): Dictionary of all words
+            word_index (DataFrame): Dictionary of all words, used as is when already filtered by `WordIndex.get_data(eligible_only=True)`
             style (CrosswordStyle): Style of crossword
-            seed (int, optional): Random seed. Defaults to 1.
+            seed (int, optional): Random seed, every `generate` call draws an independent stream from it. None seeds it from OS entropy. Defaults to 1.
+            word2vec_models (Dict[str, str], optional): Word2Vec model path per language used for themes. Defaults to WORD2VEC_MODELS.
+            tier_sizes (Tuple[int, ...], optional): Cumulative number of words per length in each dictionary tier but the last, which holds the rest. Defaults to DICTIONARY_TIERS.
         """
-        np.random.seed(seed)
-        random.seed(seed)
         self.seed = seed
+        self.seed_sequence = np.random.SeedSequence(seed)
         self.word_index = word_index
-        self.snapshots = []
+        self.steps = StepRecording((0, 0))
+        # Candidate words per length of the template fills, per dictionary
+        self.len_groups = {}
+        # Weight tiers searched by generate, per dictionary
+        self.tier_sizes = tier_sizes
+        self.tiers = {}
         self.style = style
+        self.word2vec_models = word2vec_models or WORD2VEC_MODELS
+
+        # Pre process word index unless the index build already did
+        if not word_index.attrs.get("eligible", False):
+            self.word_index = self.word_index[~self.word_index.position.isin(EXCLUDED_POSITIONS)]
+            self.word_index = self.word_index[~self.word_index.word.str.contains(INVALID_CHARACTERS.pattern)]
+            self.word_index = self.word_index[self.word_index.length >= MIN_WORD_LEN]
+            self.word_index.loc[:, "frequency"] = self.word_index["frequency"].fillna(1)
+            # Same weights as eligibility.word_weight
+            self.word_index = self.word_index.assign(
+                weight=np.log(np.log(self.word_index.frequency.clip(lower=1)) + 1) + self.word_index.length
+            )
 
-        # Pre process word index
-        self.word_index = self.word_index[~self.word_index.position.isin(['name', 'abbrev', 'symbol'])]
-        self.word_index = self.word_index[~self.word_index.word.str.contains(r"[0-9 '-.]")]
-        self.word_index = self.word_index[self.word_index.length >= MIN_WORD_LEN]
-        self.word_index.loc[:, "frequency"] = self.word_index["frequency"].fillna(1)
-
-    def __get_dictionary(self, lang_code: str, shape: tuple, clues_mode: CluesMode, theme: str = None) -> DataFrame:
+    def __get_dictionary(
+        self,
+        lang_code: str,
+        clues_mode: CluesMode,
+        theme: str = None,
+        theme_mode: ThemeMode = ThemeMode.WORD2VEC,
+    ) -> DataFrame:
+        # Words of any length, every grid shape shares the dictionary and searches the lengths that fit
         dictionary = self.word_index[self.word_index.language_code == lang_code]
-        dictionary = dictionary[dictionary.length <= max(shape)]
 
         if clues_mode == CluesMode.DEFINITION:
             dictionary = dictionary[dictionary.num_definitions > 0]
         elif clues_mode == CluesMode.SYNONYM:
             dictionary = dictionary[dictionary.num_synonyms > 0]
 
-        if theme:
+        if theme and theme_mode != ThemeMode.WORD2VEC:
+            word_ids = WordIndex().get_category_words(
+                theme, prefix=theme_mode == ThemeMode.CATEGORY_PREFIX
+            )
+            dictionary = dictionary[dictionary.id.isin(word_ids)]
+        elif theme:
             model = self.__load_word2vec(lang_code)
             words = model.wv.most_similar([theme], topn=1000)
             rows = []
@@ -113,20 +295,54 @@ class CrosswordGenerator:
 
         return dictionary
 
-    def __load_word2vec(self, lang_code: str) -> Word2Vec:
-        if lang_code == "de":
-            return Word2Vec.load("data/deu_wikipedia_2021_1M/word2vec.model")
-        if lang_code == "en":
-            return Word2Vec.load("data/eng_wikipedia_2016_1M/word2vec.model")
-        if lang_code == "es":
-            return Word2Vec.load("data/spa_wikipedia_2021_1M/word2vec.model")
-        if lang_code == "fra":
-            return Word2Vec.load("data/fra_wikipedia_2021_1M/word2vec.model")
+    def __get_tiers(
+        self,
+        lang_from: str,
+        lang_to: str,
+        clues_mode: CluesMode,
+        theme: str = None,
+        theme_mode: ThemeMode = ThemeMode.WORD2VEC,
+    ) -> List[Tuple[DataFrame, np.ndarray, np.ndarray]]:
+        """Dictionary split into tiers of the heaviest words of each length, built once per dictionary
+
+        Returns:
+            List[Tuple[DataFrame, np.ndarray, np.ndarray]]: Words of each tier sorted by length, their lengths and their letters, one word per line
+        """
+        key = (lang_from, lang_to, clues_mode, theme, theme_mode)
+        if key in self.tiers:
+            return self.tiers[key]
+
+        dictionary = self.__get_dictionary(lang_to or lang_from, clues_mode, theme, theme_mode)
+        if lang_to and lang_to != lang_from:
+            dictionary = dictionary[dictionary[f"num_{lang_from}"] > 0]
+        if "weight" in dictionary:
+            dictionary = dictionary.sort_values("weight", ascending=False, kind="stable")
 
-        raise ValueError(f"Unsupported language code {lang_code}")
+        rank = dictionary.groupby("length", observed=True).cumcount().to_numpy()
+        bounds = [0, *self.tier_sizes, len(dictionary) + 1]
+        tiers = []
+        for start, end in zip(bounds, bounds[1:]):
+            tier = dictionary[(rank >= start) & (rank < end)].sort_values("length", kind="stable")
+            if len(tier):
+                width = int(tier["length"].max())
+                letters = np.array([list(word.ljust(width)) for word in tier["word"]], dtype="U1")
+                tiers.append((tier, tier["length"].to_numpy(), letters))
 
-    def get_steps(self):
-        return self.snapshots
+        self.tiers[key] = tiers
+        return tiers
+
+    def __load_word2vec(self, lang_code: str) -> "Word2Vec":
+        if lang_code not in self.word2vec_models:
+            raise ValueError(f"Unsupported language code {lang_code}")
+
+        # gensim is slow to import, only themed generation pays for it
+        from gensim.models import Word2Vec
+
+        return Word2Vec.load(self.word2vec_models[lang_code])
+
+    def get_steps(self) -> StepRecording:
+        """Placements of the last generation, empty unless it stored its steps"""
+        return self.steps
 
     def generate(
         self,
@@ -135,8 +351,17 @@ class CrosswordGenerator:
         n_words: int,
         lang_to: str = None,
         theme: str = None,
+        theme_mode: ThemeMode = ThemeMode.WORD2VEC,
         store_steps: bool = False,
-        clues_mode: CluesMode = CluesMode.DEFINITION
+        clues_mode: CluesMode = CluesMode.DEFINITION,
+        collect_metrics: bool = False,
+        time_budget: float = None,
+        cancel_event: "Event" = None,
+        seed: int = None,
+        on_step: Callable[[dict], None] = None,
+        fetch_clues: bool = True,
+        word_grid: WordGrid = None,
+        slot_scoring: bool = True,
     ) -> Crossword:
         """Generates a crossword for the given parameters
 
@@ -146,24 +371,36 @@ class CrosswordGenerator:
             n_words (int): Number of words to include in the crossword. (result may contain less)
             lang_to (str, optional): Language code for the words only. Defaults to None.
             theme (str, optional): (Experimental) A theme for the words to use. Defaults to None.
-            store_steps (bool, optional): Whether or not to save the crossword after a new word is added. Defaults to False.
+            theme_mode (ThemeMode, optional): Whether the theme is a word to find similar words of with Word2Vec or a wiktionary category name (or prefix). Defaults to ThemeMode.WORD2VEC.
+            store_steps (bool, optional): Whether or not to record each placement, see `get_steps`. Defaults to False.
             clues_mode (CluesMode, optional): The type of clues to use for the crossword.
+            collect_metrics (bool, optional): Whether or not to attach counters and phase timers to the crossword. Defaults to False.
+            time_budget (float, optional): Seconds allowed to place words, the words placed so far are kept when it runs out and the crossword is flagged as truncated. Clue fetching is not included. Defaults to no limit.
+            cancel_event (Event, optional): Threading or multiprocessing event stopping the generation like an exhausted time budget once set. Defaults to None.
+            seed (int, optional): Random seed of this crossword. Defaults to the next stream of the generator seed.
+            on_step (Callable[[dict], None], optional): Called with the position, direction and word of each placement as it happens. Defaults to None.
+            fetch_clues (bool, optional): Whether or not to fetch the clues, `Crossword.fetch_clues` fetches them later otherwise. Defaults to True.
+            word_grid (WordGrid, optional): Grid of the given shape to place the words into, its letters constrain the placements without being part of the crossword words. Defaults to an empty grid.
+            slot_scoring (bool, optional): Whether to favor positions crossing or near the placed letters, see `SlotScorer`, instead of picking them uniformly. Defaults to True.
         Returns:
             Crossword: A crossword instance with used words and word grid
         """
 
-        self.snapshots = []
-        word_grid = WordGrid(shape)
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        # Generator owned by this call, concurrent calls never share random state
+        rng = np.random.default_rng(self.seed_sequence.spawn(1)[0] if seed is None else seed)
+        metrics = Metrics() if collect_metrics else NULL_METRICS
+        word_grid = WordGrid(shape) if word_grid is None else word_grid
+        self.steps = StepRecording(shape, word_grid)
         validation = (
             ValidationMode.SOFT
             if self.style == CrosswordStyle.BRITISH
             else ValidationMode.HARD
         )
-        dictionary = self.__get_dictionary(lang_to or lang_from, shape, clues_mode, theme)
-        if lang_to and lang_to != lang_from:
-            dictionary = dictionary[dictionary[f"num_{lang_from}"] > 0]
+        with metrics.time("dictionary"):
+            tiers = self.__get_tiers(lang_from, lang_to, clues_mode, theme, theme_mode)
 
-        direction = random.choice([Direction.DOWN, Direction.ACROSS])
+        direction = [Direction.DOWN, Direction.ACROSS][rng.integers(2)]
         word_list = []
 
         # List available positions in both directions with words that failed to be placed at each of them
@@ -184,8 +421,18 @@ class CrosswordGenerator:
             },
         }
 
+        scorer = SlotScorer(word_grid) if slot_scoring else None
+        truncated = False
         pbar = tqdm(total=n_words)
         while len(word_list) < n_words:
+            # Keep the grid built so far once the time budget is spent or the generation is cancelled
+            if (deadline is not None and time.perf_counter() >= deadline) or (
+                cancel_event is not None and cancel_event.is_set()
+            ):
+                truncated = True
+                metrics.count("truncated")
+                break
+
             # Flip current direction if its positions are exhausted
             if len(positions[direction]) == 0:
                 # Exit if all positions are exhausted
@@ -194,47 +441,81 @@ class CrosswordGenerator:
                 direction = Direction.flip(direction)
 
             # Select a random position
-            position = random.choice(list(positions[direction]))
-
-            # List potential words for that position
-            blacklist = positions[direction][position] + word_list
-            candidates = dictionary[
-                dictionary["word"].apply(
-                    lambda w: word_grid.validate_word(
-                        position, direction, w, validation
-                    )
-                )
-            ]
-            candidates = candidates[~candidates["word"].isin(blacklist)]
+            direction_positions = list(positions[direction])
+            if scorer is not None:
+                weights = scorer.weights(direction, direction_positions)
+                position = direction_positions[rng.choice(len(weights), p=weights / weights.sum())]
+            else:
+                position = direction_positions[rng.integers(len(direction_positions))]
+            metrics.count("positions_tried")
+
+            # List potential words for that position, the lighter tiers only when the heavier ones have none
+            with metrics.time("validation"):
+                blacklist = positions[direction][position] + word_list
+                space = word_grid.shape[0] - position[1] if direction == Direction.DOWN else word_grid.shape[1] - position[0]
+                crossings = word_grid.get_letters(position, direction, space)
+                # No tier when the translation filter leaves no word
+                candidates = tiers[0][0].iloc[:0] if tiers else DataFrame(columns=["id", "word", "language_code"])
+                for tier, (words, lengths, letters) in enumerate(tiers):
+                    end = np.searchsorted(lengths, space, side="right")
+                    # Words not matching the crossed letters are ruled out before the full validation
+                    fits = np.ones(end, dtype=bool)
+                    for i, letter in crossings:
+                        if i < letters.shape[1]:
+                            fits &= (lengths[:end] <= i) | (letters[:end, i] == letter)
+                    words = words.iloc[:end][fits]
+                    metrics.count("candidates_scanned", len(words))
+                    if len(words) == 0:
+                        continue
+                    candidates = words[
+                        words["word"].apply(
+                            lambda w: word_grid.validate_word(
+                                position, direction, w, validation
+                            )
+                        )
+                    ]
+                    candidates = candidates[~candidates["word"].isin(blacklist)]
+                    if len(candidates) > 0:
+                        metrics.count(f"tier_{tier}_hits")
+                        break
 
             # Remove position and restart if no candidates
             if len(candidates) == 0:
                 positions[direction].pop(position, None)
+                metrics.count("positions_exhausted")
                 continue
 
             # Chose a word by its frequency and length if possible
-            try:
-                weights = np.log(np.log(dictionary.frequency) + 1) + dictionary.length
-                word = candidates.sample(1, weights=weights, random_state=self.seed)
-            except Exception:
-                word = candidates.sample(1, random_state=12)
+            with metrics.time("sampling"):
+                row = candidates.sample(
+                    1, weights="weight" if "weight" in candidates else None, random_state=rng
+                )
 
-            word = Word(word.iloc[0], position, direction)
+                word = Word(
+                    row.word.iat[0],
+                    position,
+                    direction,
+                    int(row.id.iat[0]),
+                    row.language_code.iat[0],
+                )
 
             # Add the word to the grid
-            if not word_grid.add_word(position, direction, word):
+            with metrics.time("add_word"):
+                is_added = word_grid.add_word(position, direction, word)
+            if not is_added:
                 positions[direction][position].append(word)
+                metrics.count("rejected_placements")
                 logger.opt(lazy=True).debug(f"Can't place word {word} at {position}")
                 continue
             word_list.append(word)
+            metrics.count("words_placed")
+            if scorer is not None:
+                scorer.update(position, direction, len(word))
 
             if store_steps:
-                self.snapshots.append(
-                    (
-                        {"position": position, "direction": direction, "word": word},
-                        deepcopy(word_grid),
-                    )
-                )
+                self.steps.record(word)
+            if on_step is not None:
+                on_step(StepRecording.step_of(word))
 
             # Flip direction if possible
             if len(positions[Direction.flip(direction)]) > 0:
@@ -262,38 +543,105 @@ class CrosswordGenerator:
                 refresh=True,
             )
 
-        crossword = Crossword(word_grid, word_list, lang_from, clues_mode)
+        crossword = Crossword(
+            word_grid,
+            word_list,
+            lang_from,
+            clues_mode,
+            metrics if collect_metrics else None,
+            truncated,
+            rng,
+            fetch_clues,
+        )
         return crossword
 
+    def fill_template(
+        self,
+        template: "Template",
+        lang_from: str,
+        lang_to: str = None,
+        theme: str = None,
+        theme_mode: ThemeMode = ThemeMode.WORD2VEC,
+        clues_mode: CluesMode = CluesMode.DEFINITION,
+        time_budget: float = None,
+        seed: int = None,
+        fetch_clues: bool = True,
+    ) -> Crossword:
+        """Fills the slots of a template, e.g. picked from a `TemplateBank`, instead of searching a layout
 
-def generate_puzzle_template(shape: tuple, n_words: int) -> WordGrid:
-    data = []
-    columns = ["word", "freq", "lang_code", "len"]
-    for length in range(MIN_WORD_LEN, max(shape)):
-        data += [["x" * length, max(shape) - length, "x", length]] * n_words
+        Args:
+            template (Template): Slot layout to fill
+            lang_from (str): Language code for the vocabulary to use for clues and words
+            lang_to (str, optional): Language code for the words only. Defaults to None.
+            theme (str, optional): (Experimental) A theme for the words to use. Defaults to None.
+            theme_mode (ThemeMode, optional): Whether the theme is a word to find similar words of with Word2Vec or a wiktionary category name (or prefix). Defaults to ThemeMode.WORD2VEC.
+            clues_mode (CluesMode, optional): The type of clues to use for the crossword.
+            time_budget (float, optional): Seconds allowed to fill the slots, the crossword holds the deepest fill found and is flagged as truncated when it runs out. Defaults to no limit.
+            seed (int, optional): Random seed of this crossword. Defaults to the next stream of the generator seed.
+            fetch_clues (bool, optional): Whether or not to fetch the clues, `Crossword.fetch_clues` fetches them later otherwise. Defaults to True.
+        Returns:
+            Crossword: A crossword with the words of the filled slots, in the order of the template
+        """
+        rng = np.random.default_rng(self.seed_sequence.spawn(1)[0] if seed is None else seed)
+        key = (lang_from, lang_to, clues_mode, theme, theme_mode)
+        if key not in self.len_groups:
+            dictionary = self.__get_dictionary(lang_to or lang_from, clues_mode, theme, theme_mode)
+            if lang_to and lang_to != lang_from:
+                dictionary = dictionary[dictionary[f"num_{lang_from}"] > 0]
+            self.len_groups[key] = {
+                int(length): words for length, words in dictionary.groupby("length", observed=True)
+            }
+
+        words, word_grid, truncated = place_moves(
+            template.moves(), self.len_groups[key], WordGrid(template.shape), time_budget, rng
+        )
+        return Crossword(word_grid, words, lang_from, clues_mode, None, truncated, rng, fetch_clues)
 
-    word_index = pd.DataFrame(data, columns=columns)
 
-    gen = CrosswordGenerator(
-        word_index, CrosswordStyle.BRITISH, random.randint(0, 1000)
-    )
-    template = gen.generate(shape, "x", n_words)
-    print(template.word_grid)
+def _shuffle(candidates: DataFrame, rng: np.random.Generator) -> DataFrame:
+    """Candidates in the order of successive weighted draws without replacement, uniform without weights"""
+    if "weight" not in candidates:
+        return candidates.iloc[rng.permutation(len(candidates))]
+    # Sorting exponential keys scaled by the weights draws a weighted permutation in one pass
+    with np.errstate(divide="ignore", invalid="ignore"):
+        keys = rng.exponential(size=len(candidates)) / candidates.weight.to_numpy(dtype=float)
+    return candidates.iloc[np.argsort(keys, kind="stable")]
 
 
 def place_moves(
     moves: List[Word],
     len_groups: Dict[int, DataFrame],
     puzzle: WordGrid,
-):
+    time_budget: float = None,
+    rng: np.random.Generator = None,
+) -> Tuple[List[Word], WordGrid, bool]:
+    """Fills the moves of a puzzle template with words, backtracking on dead ends
+
+    Args:
+        moves (List[Word]): Placeholder words giving the position, direction and length of each move
+        len_groups (Dict[int, DataFrame]): Candidate words per length
+        puzzle (WordGrid): Grid to fill
+        time_budget (float, optional): Seconds allowed to search, the deepest fill found so far is returned when it runs out. Defaults to no limit.
+        rng (np.random.Generator, optional): Random generator picking the candidate words. Defaults to a freshly seeded one.
+
+    Returns:
+        Tuple[List[Word], WordGrid, bool]: Words of the deepest fill, its grid and whether the time budget ran out
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    rng = rng if rng is not None else np.random.default_rng()
     current_step = 0
     placed_words = ["" for _ in range(len(moves))]
     step_puzzles = [None for _ in range(len(moves))]
     step_words = [None for _ in range(len(moves))]
-    best_step = None
+    # Index in `step_words` of the next candidate to try per step
+    step_next = [0 for _ in range(len(moves))]
+    best_step = ([], puzzle)
 
     pbar = tqdm(total=len(moves))
     while current_step < len(moves):
+        if deadline is not None and time.perf_counter() >= deadline:
+            return best_step + (True,)
+
         if current_step == 0:
             prev_puzzle = puzzle
         else:
@@ -301,49 +649,53 @@ def place_moves(
 
         word = moves[current_step]
         if step_words[current_step] is None:
-            words = len_groups[len(word)]
-            words = words[
-                words.word.apply(
-                    lambda w: prev_puzzle.validate_word(
-                        word.position, word.direction, word
-                    )
-                )
-            ]
-            step_words[current_step] = words[~words.word.isin(placed_words)]
-
-        if len(step_words[current_step]) == 0:
+            words = len_groups.get(len(word))
+            if words is None:
+                words = pd.DataFrame(columns=["id", "word", "language_code"])
+            # Candidates must match the letters of the crossing moves, validate_word checks the rest
+            is_candidate = ~words.word.isin(placed_words[:current_step])
+            for i, letter in prev_puzzle.get_letters(word.position, word.direction, len(word)):
+                is_candidate &= words.word.str[i] == letter
+            step_words[current_step] = _shuffle(words[is_candidate], rng)
+            step_next[current_step] = 0
+
+        candidates = step_words[current_step]
+        if step_next[current_step] >= len(candidates):
             if current_step == 0:
-                return best_step
+                break
             step_words[current_step] = None
             current_step -= 1
             pbar.update(-1)
             continue
 
-        while len(step_words[current_step]) > 0:
-            word = Word(
-                step_words[current_step].sample(1), word.position, word.direction
-            )
-            step_words[current_step].drop(word.meta.index, inplace=True)
-
-            step_puzzle = deepcopy(prev_puzzle)
-            if step_puzzle.add_word(word.position, word.direction, word):
+        while step_next[current_step] < len(candidates):
+            # Dead end steps can try many candidates, the deadline is checked for each of them
+            if deadline is not None and time.perf_counter() >= deadline:
+                return best_step + (True,)
+
+            row = candidates.iloc[step_next[current_step]]
+            step_next[current_step] += 1
+            word = Word.from_row(row, word.position, word.direction)
+            # Only the accepted candidate gets a copy of the grid
+            if prev_puzzle.validate_word(word.position, word.direction, word):
+                step_puzzle = deepcopy(prev_puzzle)
+                step_puzzle.place_word(word.position, word.direction, word)
                 step_puzzles[current_step] = step_puzzle
-                current_step_word = placed_words[current_step]
                 placed_words[current_step] = word
-                if not current_step_word:
-                    best_step = (deepcopy(placed_words), step_puzzle)
+                if current_step >= len(best_step[0]):
+                    best_step = (placed_words[: current_step + 1], step_puzzle)
                 current_step += 1
                 pbar.update(1)
                 break
 
-    return best_step
+    return best_step + (False,)
 
 
 if __name__ == "__main__":
     logger.remove()
     logger.add(sys.stdout, level="ERROR")
 
-    word_index = WordIndex().get_data()
+    word_index = WordIndex().get_data(["en", "de"], eligible_only=True)
     gen = CrosswordGenerator(word_index, CrosswordStyle.BRITISH, seed=18)
     crossword = gen.generate((8, 16), "en", 20, lang_to="de", clues_mode=CluesMode.TRANSLATION)
     print(crossword.words)
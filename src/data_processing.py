@@ -1,38 +1,80 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import glob
 import json
 import os
 import sqlite3
 
 from tqdm import tqdm
-from gensim.models import Word2Vec
-from gensim.utils import simple_preprocess
-from nltk.corpus import stopwords
 from invoke import task
 
-def extract_frequencies() -> None:
-    files = glob.glob("./data/*/*-words.json")
-    freq_data = {}
-    for filename in files:
+from definition_store import DEFINITION_STORE, export_definitions
+from eligibility import is_eligible, word_weight
+
+DATA_DIR = "data"
+SCHEMA_PATH = os.path.join(DATA_DIR, "create_db.sql")
+
+CORPUS_LANGUAGES = {
+    "de": "german",
+    "en": "english",
+    "fr": "french",
+    "sp": "spanish",
+}
+
+
+class SentenceCorpus:
+    """Restartable iterable over a wortschatz sentences file, tokenized on the fly"""
+
+    def __init__(self, filename: str, stop_words: set) -> None:
+        """
+        Args:
+            filename (str): Path to the `*-sentences.txt` file
+            stop_words (set): Words removed from the tokenized sentences
+        """
+        self.filename = filename
+        self.stop_words = stop_words
+
+    def __iter__(self):
+        from gensim.utils import simple_preprocess
+
+        with open(self.filename, "r", encoding="utf-8") as file:
+            for line in file:
+                sentence = line.split("\t")[1].strip()
+                tokens = simple_preprocess(sentence.lower())
+                yield [word for word in tokens if word not in self.stop_words]
+
+
+def extract_frequencies(data_dir: str = DATA_DIR) -> None:
+    conn = sqlite3.connect(os.path.join(data_dir, "words.db"))
+    cursor = conn.cursor()
+
+    for filename in glob.glob(os.path.join(data_dir, "*", "*-words.json")):
+        lang_code = os.path.basename(filename)[:2]
+        if lang_code == "sp":
+            lang_code = "es"
+
         with open(filename, "r", encoding="utf-8") as file:
-            lang_code = os.path.basename(filename)[:2]
-            if lang_code == "sp":
-                lang_code = "es"
-            freq_data[lang_code] = json.load(file)
+            frequencies = json.load(file)
 
-    with open("data/word_freq.json", "w", encoding="utf-8") as file:
-        json.dump(freq_data, file)
+        cursor.execute("DELETE FROM frequencies WHERE language_code = ?", (lang_code,))
+        cursor.executemany(
+            """
+            INSERT OR REPLACE INTO frequencies (language_code, word, frequency)
+            VALUES (?, ?, ?)
+            """,
+            ((lang_code, word, freq) for word, freq in frequencies.items()),
+        )
+        conn.commit()
 
+    conn.close()
 
-def load_wiktextract():
-    with open("data/word_freq.json", "r", encoding="utf-8") as file:
-        freq_data = json.load(file)
 
-    conn = sqlite3.connect("data/words.db")
+def load_wiktextract(data_dir: str = DATA_DIR):
+    conn = sqlite3.connect(os.path.join(data_dir, "words.db"))
     cursor = conn.cursor()
 
     categories_ref = {}
 
-    for extract in glob.glob("data/*.jsonl"):
+    for extract in glob.glob(os.path.join(data_dir, "*.jsonl")):
         lang_code = os.path.basename(extract).split("-")[0]
 
         count = 0
@@ -62,27 +104,18 @@ def load_wiktextract():
                 if data["lang_code"] != lang_code:
                     continue
 
-                if (
-                    lang_code in freq_data
-                    and data["word"] in freq_data[data["lang_code"]]
-                ):
-                    freq = freq_data[lang_code][data["word"]]
-                else:
-                    freq = None
-
                 word_data = (
                     data["word"],
                     index,
                     len(data["word"]),
                     data["lang_code"],
                     data["pos"],
-                    freq,
                 )
 
                 cursor.execute(
                     """
-                    INSERT INTO words (word, source_index, length, language_code, position, frequency)
-                    VALUES (?, ?, ?, ?, ?, ?)
+                    INSERT INTO words (word, source_index, length, language_code, position)
+                    VALUES (?, ?, ?, ?, ?)
                     """,
                     word_data,
                 )
@@ -123,13 +156,25 @@ def load_wiktextract():
                             "INSERT INTO word_categories VALUES (?, ?)", cat_data
                         )
 
+        # Join the extracted frequencies once the whole language is loaded
+        cursor.execute(
+            """
+            UPDATE words
+            SET frequency = (
+                SELECT f.frequency FROM frequencies f
+                WHERE f.language_code = words.language_code AND f.word = words.word
+            )
+            WHERE language_code = ?
+            """,
+            (lang_code,),
+        )
         conn.commit()
 
     conn.close()
 
 
-def load_wiktionary_traductions():
-    conn = sqlite3.connect("data/words.db")
+def load_wiktionary_traductions(data_dir: str = DATA_DIR):
+    conn = sqlite3.connect(os.path.join(data_dir, "words.db"))
     cursor = conn.cursor()
 
     cursor.execute("SELECT id, language_code, source_index, position, word FROM words")
@@ -147,7 +192,7 @@ def load_wiktionary_traductions():
         word_lang_id[(word, position, lang_code)].append(word_id)
         index_id[lang_code][source_index] = word_id
 
-    for extract in glob.glob("data/*.jsonl"):
+    for extract in glob.glob(os.path.join(data_dir, "*.jsonl")):
         lang_code = os.path.basename(extract).split("-")[0]
 
         count = 0
@@ -207,8 +252,8 @@ def load_wiktionary_traductions():
     conn.close()
     
 
-def load_wiktionary_synonyms():
-    conn = sqlite3.connect("data/words.db")
+def load_wiktionary_synonyms(data_dir: str = DATA_DIR):
+    conn = sqlite3.connect(os.path.join(data_dir, "words.db"))
     cursor = conn.cursor()
 
     cursor.execute("SELECT id, language_code, source_index, position, word FROM words")
@@ -226,7 +271,7 @@ def load_wiktionary_synonyms():
         word_lang_id[(word, position, lang_code)].append(word_id)
         index_id[lang_code][source_index] = word_id
 
-    for extract in glob.glob("data/*.jsonl"):
+    for extract in glob.glob(os.path.join(data_dir, "*.jsonl")):
         lang_code = os.path.basename(extract).split("-")[0]
 
         count = 0
@@ -281,48 +326,142 @@ def extract_word_frequencies(ctx):
     extract_frequencies()
 
 
+def load_eligibility(data_dir: str = DATA_DIR):
+    """Flags the words that can be used in crosswords and computes their sampling weight"""
+    conn = sqlite3.connect(os.path.join(data_dir, "words.db"))
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, word, position, length, frequency FROM words")
+    rows = cursor.fetchall()
+
+    cursor.executemany(
+        "UPDATE words SET eligible = ?, weight = ? WHERE id = ?",
+        (
+            (is_eligible(word, position), word_weight(frequency, length), word_id)
+            for word_id, word, position, length, frequency in tqdm(rows, desc="eligibility")
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def load_translation_pairs(data_dir: str = DATA_DIR):
+    """Materializes the translations of each language pair for the generator"""
+    conn = sqlite3.connect(os.path.join(data_dir, "words.db"))
+    conn.execute("DELETE FROM translation_pairs")
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO translation_pairs (lang_from, lang_to, word_id, translation_id, translation)
+        SELECT w1.language_code, w2.language_code, w1.id, w2.id, w2.word
+        FROM translations t
+            JOIN words w1 ON t.word_from_id = w1.id
+            JOIN words w2 ON t.word_to_id = w2.id
+        """
+    )
+    conn.commit()
+    conn.close()
+
+
+def create_database(data_dir: str = DATA_DIR) -> None:
+    """Creates (or resets) the word index tables of `words.db` in the data directory"""
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as file:
+        schema = file.read()
+
+    conn = sqlite3.connect(os.path.join(data_dir, "words.db"))
+    conn.executescript(schema)
+    conn.close()
+
+
+# Steps of the word index build, in order
+INDEX_PHASES = [
+    load_wiktextract,
+    load_eligibility,
+    load_wiktionary_synonyms,
+    load_wiktionary_traductions,
+    load_translation_pairs,
+]
+
+
+@task
+def create_word_database(ctx):
+    create_database()
+
+
 @task
 def create_word_index(ctx):
-    load_wiktextract()
-    load_wiktionary_synonyms()
-    load_wiktionary_traductions()
-    
+    for phase in INDEX_PHASES:
+        phase()
+
+
 @task
-def train_word2vec(ctx):
-    files = glob.glob("./data/*/*-sentences.txt")
-    for filename in files:
-        data = []
-        with open(filename, "r", encoding="utf-8") as file:
-            for line in file:
-                data.append(line.split("\t")[1].strip())
+def export_definition_store(ctx, path=DEFINITION_STORE, block_size=64):
+    """Exports the definitions to a compressed store that WordIndex can read without SQLite
+
+    Args:
+        path (str, optional): Path of the store. Defaults to DEFINITION_STORE.
+        block_size (int, optional): Number of words per compressed block. Defaults to 64.
+    """
+    n_words = export_definitions(os.path.join(DATA_DIR, "words.db"), path, block_size)
+    print(f"Exported the definitions of {n_words} words to {path} ({os.path.getsize(path) / 1024**2:.1f} MB)")
+
+
+def train_language_model(filename: str, workers: int = 4, stop_words: set = None) -> str:
+    """Trains and saves the Word2Vec model of a single wortschatz corpus
+
+    Args:
+        filename (str): Path to the `*-sentences.txt` file of the corpus
+        workers (int, optional): Number of gensim worker threads. Defaults to 4.
+        stop_words (set, optional): Words to ignore. Defaults to the nltk stopwords of the corpus language.
+
+    Returns:
+        str: Path of the saved model
+    """
+    # gensim and nltk are slow to import, only training tasks load them
+    from gensim.models import Word2Vec
+
+    if stop_words is None:
+        from nltk.corpus import stopwords
 
         lang_code = os.path.basename(filename)[:2]
+        if lang_code not in CORPUS_LANGUAGES:
+            raise ValueError(f"Unsupported corpus language {lang_code}")
+        stop_words = set(stopwords.words(CORPUS_LANGUAGES[lang_code]))
+    sentences = SentenceCorpus(filename, stop_words)
 
-        if lang_code == "sp":
-            language = "spanish"
-        elif lang_code == "fr":
-            language = "french"
-        elif lang_code == "en":
-            language = "english"
-        elif lang_code == "de":
-            language = "german"
-
-        # Tokenize the text data
-        stop_words = set(stopwords.words(language))
-        sentences = []
-        for sentence in tqdm(data):
-            tokens = simple_preprocess(sentence.lower())
-            tokens = [word for word in tokens if word not in stop_words]
-            sentences.append(tokens)
-
-        # Train the Word2Vec model
-        model = Word2Vec(sentences, vector_size=200, window=7, min_count=1, workers=4)
-        model.save(os.path.join(os.path.dirname(filename), "word2vec.model"))
+    # Train the Word2Vec model, gensim iterates the corpus once per epoch
+    model = Word2Vec(sentences, vector_size=200, window=7, min_count=1, workers=workers)
+    model_path = os.path.join(os.path.dirname(filename), "word2vec.model")
+    model.save(model_path)
+
+    return model_path
+
+
+@task
+def train_word2vec(ctx, workers=4, processes=0):
+    """Trains a Word2Vec model for each corpus, languages are trained concurrently
+
+    Args:
+        workers (int, optional): Number of gensim worker threads per language. Defaults to 4.
+        processes (int, optional): Number of languages trained at once, 0 for all. Defaults to 0.
+    """
+    files = glob.glob("./data/*/*-sentences.txt")
+    if not files:
+        return
+
+    with ProcessPoolExecutor(max_workers=processes or len(files)) as executor:
+        futures = {
+            executor.submit(train_language_model, filename, workers): filename
+            for filename in files
+        }
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            tqdm.write(f"Saved model {future.result()} for {futures[future]}")
 
 
 @task
 def test_word2vec(ctx):
-    model = Word2Vec.load("data\deu_wikipedia_2016_1M\word2vec.model")
+    from gensim.models import Word2Vec
+
+    model = Word2Vec.load("data/deu_wikipedia_2016_1M/word2vec.model")
 
     # Example 1: Finding similar words
     word = "king"
@@ -0,0 +1,153 @@
+from array import array
+from collections import OrderedDict
+from itertools import groupby
+import mmap
+import sqlite3
+import struct
+import tempfile
+import threading
+from typing import List
+import zlib
+
+import numpy as np
+
+# Default location of the exported store
+DEFINITION_STORE = "data/definitions.store"
+
+MAGIC = b"CLDS"
+VERSION = 1
+# magic, version, number of words, number of blocks, words per block
+HEADER = struct.Struct("<4sIIII")
+
+# Separators of the definitions of a word and of the words of a block
+DEFINITION_SEPARATOR = "\x1f"
+WORD_SEPARATOR = "\x1e"
+
+
+def export_definitions(
+    db_path: str, path: str = DEFINITION_STORE, block_size: int = 64, level: int = 6
+) -> int:
+    """Exports the definitions table to a compressed read-only store
+
+    The store holds a header, the sorted word ids (int32), the offsets of the
+    compressed blocks (uint64) and the zlib blocks of `block_size` words each.
+
+    Args:
+        db_path (str): Path of the SQLite index
+        path (str, optional): Path of the store. Defaults to DEFINITION_STORE.
+        block_size (int, optional): Number of words per compressed block. Defaults to 64.
+        level (int, optional): zlib compression level. Defaults to 6.
+
+    Returns:
+        int: Number of words exported
+    """
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT word_id, definition FROM definitions ORDER BY word_id, id")
+
+    word_ids = array("i")
+    offsets = array("Q", [0])
+    block = []
+
+    with tempfile.TemporaryFile() as blocks:
+
+        def write_block():
+            data = zlib.compress(WORD_SEPARATOR.join(block).encode("utf-8"), level)
+            blocks.write(data)
+            offsets.append(offsets[-1] + len(data))
+            block.clear()
+
+        for word_id, word_rows in groupby(rows, key=lambda row: row[0]):
+            definitions = (
+                definition.replace(DEFINITION_SEPARATOR, " ").replace(WORD_SEPARATOR, " ")
+                for _, definition in word_rows
+            )
+            word_ids.append(word_id)
+            block.append(DEFINITION_SEPARATOR.join(definitions))
+            if len(block) == block_size:
+                write_block()
+
+        if block:
+            write_block()
+        conn.close()
+
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(word_ids), len(offsets) - 1, block_size))
+            file.write(word_ids.tobytes())
+            file.write(offsets.tobytes())
+            blocks.seek(0)
+            while chunk := blocks.read(1 << 20):
+                file.write(chunk)
+
+    return len(word_ids)
+
+
+class DefinitionStore:
+    """Memory-mapped reader of an exported definition store"""
+
+    def __init__(self, path: str = DEFINITION_STORE, cached_blocks: int = 256) -> None:
+        """
+        Args:
+            path (str, optional): Path of the store. Defaults to DEFINITION_STORE.
+            cached_blocks (int, optional): Number of decompressed blocks kept in memory. Defaults to 256.
+        """
+        self.file = open(path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_words, n_blocks, self.block_size = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} definition store")
+
+        offset = HEADER.size
+        self.word_ids = np.frombuffer(self.mmap, dtype="<i4", count=n_words, offset=offset)
+        offset += self.word_ids.nbytes
+        self.block_offsets = np.frombuffer(self.mmap, dtype="<u8", count=n_blocks + 1, offset=offset)
+        self.data_start = offset + self.block_offsets.nbytes
+
+        self.cached_blocks = cached_blocks
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.word_ids)
+
+    def __contains__(self, word_id: int) -> bool:
+        return self.__rank(word_id) is not None
+
+    def __rank(self, word_id: int) -> int:
+        rank = int(np.searchsorted(self.word_ids, word_id))
+        if rank < len(self.word_ids) and self.word_ids[rank] == word_id:
+            return rank
+        return None
+
+    def __read_block(self, block_id: int) -> List[str]:
+        with self.lock:
+            block = self.blocks.get(block_id)
+            if block is not None:
+                self.blocks.move_to_end(block_id)
+                return block
+
+        start = self.data_start + int(self.block_offsets[block_id])
+        end = self.data_start + int(self.block_offsets[block_id + 1])
+        block = zlib.decompress(self.mmap[start:end]).decode("utf-8").split(WORD_SEPARATOR)
+
+        with self.lock:
+            self.blocks[block_id] = block
+            if len(self.blocks) > self.cached_blocks:
+                self.blocks.popitem(last=False)
+        return block
+
+    def get(self, word_id: int) -> List[str]:
+        """Definitions of a word, an empty list when it has none"""
+        rank = self.__rank(word_id)
+        if rank is None:
+            return []
+
+        definitions = self.__read_block(rank // self.block_size)[rank % self.block_size]
+        return definitions.split(DEFINITION_SEPARATOR)
+
+    def close(self) -> None:
+        # The arrays hold buffers of the memory map, release them first
+        self.word_ids = self.block_offsets = None
+        self.blocks.clear()
+        self.mmap.close()
+        self.file.close()
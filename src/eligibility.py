@@ -0,0 +1,33 @@
+import math
+import re
+
+MIN_WORD_LEN = 3
+
+# Parts of speech that can't be clued
+EXCLUDED_POSITIONS = ["name", "abbrev", "symbol"]
+
+# Digits, spaces and punctuation can't be placed in a grid
+INVALID_CHARACTERS = re.compile(r"[0-9 '-.]")
+
+
+def is_eligible(word: str, position: str) -> bool:
+    """Whether a word can be placed in a crossword"""
+    return (
+        len(word) >= MIN_WORD_LEN
+        and position not in EXCLUDED_POSITIONS
+        and INVALID_CHARACTERS.search(word) is None
+    )
+
+
+def word_weight(frequency: float, length: int) -> float:
+    """Sampling weight of a word, favors frequent and long words
+
+    Args:
+        frequency (float): Corpus frequency of the word, None when unknown
+        length (int): Length of the word
+
+    Returns:
+        float: log(log(frequency) + 1) + length, unknown and rare words weigh their length
+    """
+    frequency = max(frequency or 1, 1)
+    return math.log(math.log(frequency) + 1) + length
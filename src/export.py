@@ -0,0 +1,263 @@
+import gzip
+import json
+import struct
+import time
+from typing import Iterable, Iterator, Tuple, Union
+
+from invoke import task
+from loguru import logger
+import numpy as np
+
+from crossword import Crossword, CluesMode, CrosswordStyle, ThemeMode
+from fingerprint import FingerprintIndex, grid_fingerprint, words_fingerprint
+from puzzle_pool import PuzzleKey, WorkerPool, generate_key
+from word_grid import Direction, WordGrid
+
+# Start of the decompressed binary exports, JSONL exports start with "{"
+MAGIC = b"CLPZ"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sI")
+# Byte length of a record
+RECORD_LENGTH = struct.Struct("<I")
+# rows, cols, number of words, truncated
+RECORD_HEADER = struct.Struct("<BBHB")
+# Byte length of a string, NONE_LENGTH for None
+STRING_LENGTH = struct.Struct("<I")
+NONE_LENGTH = 0xFFFFFFFF
+
+
+def crossword_record(crossword: Crossword) -> dict:
+    """Flat and JSON serializable form of a crossword
+
+    The grid is a string of the cells row by row, each word has a slot (column, row,
+    direction, length), an id and a clue, with the id of the clue word or -1.
+    """
+    return {
+        "shape": [int(size) for size in crossword.word_grid.puzzle.shape],
+        "grid": "".join(crossword.word_grid.puzzle.ravel()),
+        "lang_from": crossword.lang_from,
+        "language_code": crossword.words[0].language_code if crossword.words else None,
+        "truncated": crossword.truncated,
+        "slots": [
+            [word.position[0], word.position[1], word.direction.value, len(word)]
+            for word in crossword.words
+        ],
+        "word_ids": [word.id for word in crossword.words],
+        "words": [str(word) for word in crossword.words],
+        "clue_ids": [-1 if getattr(clue, "id", None) is None else clue.id for clue in crossword.clues],
+        "clues": [None if clue is None else str(clue) for clue in crossword.clues],
+    }
+
+
+def record_grid(record: dict) -> WordGrid:
+    """Rebuilds the grid of an exported record by replaying its words"""
+    word_grid = WordGrid(tuple(record["shape"]))
+    for (x, y, direction, _), word in zip(record["slots"], record["words"]):
+        word_grid.place_word((x, y), Direction(direction), word)
+    return word_grid
+
+
+def _pack_string(value: str) -> bytes:
+    if value is None:
+        return STRING_LENGTH.pack(NONE_LENGTH)
+    data = value.encode("utf-8")
+    return STRING_LENGTH.pack(len(data)) + data
+
+
+def _pack_record(record: dict) -> bytes:
+    n_words = len(record["words"])
+    parts = [
+        RECORD_HEADER.pack(*record["shape"], n_words, record["truncated"]),
+        _pack_string(record["lang_from"]),
+        _pack_string(record["language_code"]),
+        _pack_string(record["grid"]),
+        np.array(record["slots"], dtype=np.uint8).reshape(n_words, 4).tobytes(),
+        np.array(record["word_ids"], dtype="<i4").tobytes(),
+        np.array(record["clue_ids"], dtype="<i4").tobytes(),
+    ]
+    parts += [_pack_string(word) for word in record["words"]]
+    parts += [_pack_string(clue) for clue in record["clues"]]
+    data = b"".join(parts)
+    return RECORD_LENGTH.pack(len(data)) + data
+
+
+class _RecordReader:
+    """Cursor over the bytes of a binary record"""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def array(self, dtype: str, count: int) -> np.ndarray:
+        values = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.offset)
+        self.offset += values.nbytes
+        return values
+
+    def string(self) -> str:
+        (length,) = self.unpack(STRING_LENGTH)
+        if length == NONE_LENGTH:
+            return None
+        value = self.data[self.offset : self.offset + length].decode("utf-8")
+        self.offset += length
+        return value
+
+
+def _unpack_record(data: bytes) -> dict:
+    reader = _RecordReader(data)
+    rows, cols, n_words, truncated = reader.unpack(RECORD_HEADER)
+    return {
+        "shape": [rows, cols],
+        "lang_from": reader.string(),
+        "language_code": reader.string(),
+        "grid": reader.string(),
+        "truncated": bool(truncated),
+        "slots": reader.array(np.uint8, n_words * 4).reshape(n_words, 4).tolist(),
+        "word_ids": reader.array("<i4", n_words).tolist(),
+        "clue_ids": reader.array("<i4", n_words).tolist(),
+        "words": [reader.string() for _ in range(n_words)],
+        "clues": [reader.string() for _ in range(n_words)],
+    }
+
+
+class PuzzleWriter:
+    """Streams crosswords to a gzip compressed JSONL or binary export"""
+
+    def __init__(self, path: str, binary: bool = None, level: int = 6) -> None:
+        """
+        Args:
+            path (str): Path of the export
+            binary (bool, optional): Whether to write binary records instead of JSON lines. Defaults to binary unless the path ends with ".jsonl.gz".
+            level (int, optional): gzip compression level. Defaults to 6.
+        """
+        self.binary = not path.endswith(".jsonl.gz") if binary is None else binary
+        self.file = gzip.open(path, "wb", compresslevel=level)
+        self.count = 0
+        if self.binary:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self) -> "PuzzleWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, crossword: Union[Crossword, dict]) -> None:
+        """Appends a crossword, or a record of `crossword_record`"""
+        record = crossword if isinstance(crossword, dict) else crossword_record(crossword)
+        if self.binary:
+            self.file.write(_pack_record(record))
+        else:
+            self.file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.count += 1
+
+    def write_all(self, crosswords: Iterable[Union[Crossword, dict]]) -> int:
+        for crossword in crosswords:
+            self.write(crossword)
+        return self.count
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_puzzles(path: str) -> Iterator[dict]:
+    """Lazily reads the records of an export, binary or JSONL
+
+    Yields:
+        dict: Records in the form of `crossword_record`
+    """
+    with gzip.open(path, "rb") as file:
+        header = file.read(FILE_HEADER.size)
+        if header[: len(MAGIC)] != MAGIC:
+            # JSONL export, the header is the start of the first line
+            first = header + file.readline()
+            if first.strip():
+                yield json.loads(first)
+            for line in file:
+                yield json.loads(line)
+            return
+
+        _, version = FILE_HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} puzzle export")
+
+        while length := file.read(RECORD_LENGTH.size):
+            (size,) = RECORD_LENGTH.unpack(length)
+            yield _unpack_record(file.read(size))
+
+
+def _generate_record(args: Tuple[PuzzleKey, int, float, int]) -> dict:
+    key, n_words, time_budget, seed = args
+    crossword = generate_key(key, n_words, time_budget=time_budget, seed=seed)
+    # Records are much smaller to send back than crosswords
+    return crossword_record(crossword)
+
+
+@task
+def export_puzzles(
+    ctx,
+    path="data/puzzles.bin.gz",
+    count=1000,
+    shape="8x8",
+    lang_from="en",
+    lang_to="",
+    clues_mode="definition",
+    style="american",
+    theme="",
+    theme_mode="word2vec",
+    n_words=12,
+    time_budget=0.0,
+    processes=0,
+    db_path="data/words.db",
+    seed=-1,
+    fingerprints=":memory:",
+):
+    """Generates puzzles in parallel and streams them to an export as they finish
+
+    Args:
+        path (str, optional): Path of the export, JSON lines when it ends with ".jsonl.gz". Defaults to "data/puzzles.bin.gz".
+        count (int, optional): Number of puzzles. Defaults to 1000.
+        shape (str, optional): Grid shape. Defaults to "8x8".
+        lang_from (str, optional): Language of the clues. Defaults to "en".
+        lang_to (str, optional): Language of the words. Defaults to lang_from.
+        clues_mode (str, optional): Clues mode. Defaults to "definition".
+        style (str, optional): Crossword style. Defaults to "american".
+        theme (str, optional): Theme of the words, empty for no theme. Defaults to "".
+        theme_mode (str, optional): Theme mode. Defaults to "word2vec".
+        n_words (int, optional): Words to place per puzzle. Defaults to 12.
+        time_budget (float, optional): Seconds allowed to each generation. Defaults to no limit.
+        processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        db_path (str, optional): Path of the word index. Defaults to "data/words.db".
+        seed (int, optional): Random seed, negative for a random seed. Defaults to -1.
+        fingerprints (str, optional): Path of the fingerprint index skipping duplicate puzzles, empty to keep duplicates. Defaults to an index of this export only.
+    """
+    key = PuzzleKey(
+        tuple(map(int, shape.split("x"))),
+        lang_from,
+        lang_to or None,
+        CluesMode[clues_mode.upper()],
+        CrosswordStyle[style.upper()],
+        theme or None,
+        ThemeMode[theme_mode.upper()],
+    )
+    seeds = np.random.SeedSequence(seed if seed >= 0 else None).generate_state(count)
+    languages = sorted({lang_from, lang_to or lang_from})
+    index = FingerprintIndex(fingerprints) if fingerprints else None
+    start = time.perf_counter()
+
+    with WorkerPool(db_path, languages, processes or None) as workers, PuzzleWriter(path) as writer:
+        requests = ((key, n_words, time_budget or None, int(puzzle_seed)) for puzzle_seed in seeds)
+        for record in workers.pool.imap_unordered(_generate_record, requests, chunksize=8):
+            if index is None or index.add(
+                grid_fingerprint(record_grid(record)), words_fingerprint(record["words"]), key.name
+            ):
+                writer.write(record)
+
+    logger.info(f"Exported {writer.count} puzzles to {path} in {time.perf_counter() - start:.1f}s")
+    if index is not None:
+        logger.info(f"Skipped {index.duplicates} duplicates, dedup rate {index.dedup_rate:.1%}")
+        index.close()
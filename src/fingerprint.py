@@ -0,0 +1,118 @@
+from hashlib import blake2b
+import sqlite3
+import threading
+from typing import Iterable, Tuple, Union
+
+import numpy as np
+
+from word_grid import WordGrid
+
+# Default location of the fingerprint index
+FINGERPRINT_INDEX = "data/fingerprints.db"
+
+FINGERPRINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    -- Generation parameters the puzzle is unique for, e.g. PuzzleKey.name
+    key TEXT NOT NULL,
+    grid BLOB NOT NULL,
+    words BLOB NOT NULL,
+    PRIMARY KEY (key, grid)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS fingerprints_words ON fingerprints (key, words);
+"""
+
+DIGEST_SIZE = 16
+
+
+def grid_fingerprint(grid: Union[WordGrid, np.ndarray]) -> bytes:
+    """Hash of the letters of a grid, identical for the grid and its transposition
+
+    Args:
+        grid (Union[WordGrid, np.ndarray]): Grid, or its letters, flipped or not
+    """
+    puzzle = grid.puzzle if isinstance(grid, WordGrid) else grid
+    # The smallest text of the grid and its transposition is the canonical one
+    canonical = min(
+        f"{view.shape[0]}x{view.shape[1]}:" + "".join(view.ravel()) for view in (puzzle, puzzle.T)
+    )
+    return blake2b(canonical.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def words_fingerprint(words: Iterable[str]) -> bytes:
+    """Hash of a set of words, whatever their order and placement"""
+    canonical = "\x1f".join(sorted(str(word).lower() for word in words))
+    return blake2b(canonical.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def puzzle_fingerprints(puzzle: dict) -> Tuple[bytes, bytes]:
+    """Grid and words fingerprints of a `Crossword.to_dict()` result"""
+    return grid_fingerprint(np.array(puzzle["word_grid"])), words_fingerprint(puzzle["words"])
+
+
+class FingerprintIndex:
+    """Persistent set of puzzle fingerprints rejecting duplicates in constant time
+
+    A puzzle is a duplicate of a stored one when it has the same grid, possibly
+    transposed, or the same set of words for the same key.
+    """
+
+    def __init__(self, path: str = FINGERPRINT_INDEX) -> None:
+        """
+        Args:
+            path (str, optional): Path of the index, ":memory:" for a temporary index. Defaults to FINGERPRINT_INDEX.
+        """
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(FINGERPRINT_SCHEMA)
+        self.lock = threading.Lock()
+        self.added = 0
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def add(self, grid: bytes, words: bytes, key: str = "") -> bool:
+        """Stores the fingerprints of a puzzle unless it is a duplicate
+
+        Args:
+            grid (bytes): Fingerprint of the grid, see `grid_fingerprint`
+            words (bytes): Fingerprint of the words, see `words_fingerprint`
+            key (str, optional): Generation parameters of the puzzle. Defaults to "".
+
+        Returns:
+            bool: Whether the puzzle is new
+        """
+        with self.lock:
+            duplicate = self.conn.execute(
+                "SELECT 1 FROM fingerprints WHERE key = ? AND words = ?", (key, words)
+            ).fetchone() is not None
+            if not duplicate:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO fingerprints (key, grid, words) VALUES (?, ?, ?)", (key, grid, words)
+                )
+                self.conn.commit()
+                duplicate = cursor.rowcount == 0
+
+            if duplicate:
+                self.duplicates += 1
+            else:
+                self.added += 1
+        return not duplicate
+
+    def add_puzzle(self, puzzle: dict, key: str = "") -> bool:
+        """`add` of a `Crossword.to_dict()` result"""
+        return self.add(*puzzle_fingerprints(puzzle), key)
+
+    @property
+    def dedup_rate(self) -> float:
+        """Fraction of the puzzles rejected as duplicates since the index was opened"""
+        total = self.added + self.duplicates
+        return self.duplicates / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {"added": self.added, "duplicates": self.duplicates, "dedup_rate": self.dedup_rate}
+
+    def close(self) -> None:
+        self.conn.close()
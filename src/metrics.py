@@ -0,0 +1,42 @@
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+import time
+from typing import Dict
+
+
+class Metrics:
+    """Collects counters and cumulative timers of a crossword generation"""
+
+    def __init__(self) -> None:
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    @contextmanager
+    def time(self, name: str):
+        """Adds the time spent in the `with` block to the `name` timer"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - start
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {"counters": dict(self.counters), "timers": dict(self.timers)}
+
+
+class NullMetrics(Metrics):
+    """Metrics collector that records nothing, used when metrics are disabled"""
+
+    _context = nullcontext()
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+    def time(self, name: str):
+        return self._context
+
+
+NULL_METRICS = NullMetrics()
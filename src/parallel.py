@@ -0,0 +1,301 @@
+from itertools import product
+import multiprocessing
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+from loguru import logger
+import numpy as np
+
+from crossword import Crossword, CluesMode, CrosswordStyle
+from puzzle_pool import WORKER_GENERATORS, WORKER_STATE, WorkerPool
+from word_grid import ValidationMode, WordGrid
+from words import Word, WordIndex
+
+def _generate(task: Tuple[int, float, CrosswordStyle, tuple, dict]) -> Tuple[int, Crossword]:
+    seed, deadline, style, args, kwargs = task
+    # Wall clock deadline, the monotonic clocks of processes are not comparable everywhere
+    time_budget = None if deadline is None else max(deadline - time.time(), 0)
+    crossword = WORKER_GENERATORS[style].generate(
+        *args,
+        time_budget=time_budget,
+        cancel_event=WORKER_STATE["cancel_event"],
+        seed=seed,
+        **kwargs,
+    )
+    return seed, crossword
+
+
+def density(crossword: Crossword) -> float:
+    """Fraction of the grid cells covered by words"""
+    return float((crossword.word_grid.state != 0).mean())
+
+
+class SeedRacer(WorkerPool):
+    """Pool of worker processes generating the same crossword with different seeds
+
+    Generation time varies a lot with the seed, racing several seeds and keeping
+    the first good enough crossword cuts the tail latency of single requests.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/words.db",
+        languages: List[str] = None,
+        style: CrosswordStyle = CrosswordStyle.AMERICAN,
+        processes: int = None,
+        word2vec_models: Dict[str, str] = None,
+        mp_context: str = "spawn",
+        seed: int = None,
+    ) -> None:
+        """
+        Args:
+            db_path (str, optional): Path of the word index. Defaults to "data/words.db".
+            languages (List[str], optional): Languages loaded by the workers. Defaults to all languages.
+            style (CrosswordStyle, optional): Style of the crosswords. Defaults to CrosswordStyle.AMERICAN.
+            processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            word2vec_models (Dict[str, str], optional): Word2Vec model path per language used for themes. Defaults to WORD2VEC_MODELS.
+            mp_context (str, optional): Multiprocessing start method. Defaults to "spawn".
+            seed (int, optional): Random seed the races without explicit seeds draw their seeds from. Defaults to a random seed.
+        """
+        super().__init__(db_path, languages, processes, word2vec_models, mp_context)
+        self.style = style
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.pending = None
+
+    def __wait_pending(self) -> None:
+        # Cancelled generations of the previous race stop at their next placement
+        if self.pending is not None:
+            for _ in self.pending:
+                pass
+            self.pending = None
+
+    def race(
+        self,
+        shape: Tuple[int, int],
+        lang_from: str,
+        n_words: int,
+        seeds: Iterable[int] = None,
+        target_words: int = None,
+        target_density: float = None,
+        time_budget: float = None,
+        **kwargs,
+    ) -> Crossword:
+        """Generates a crossword with several seeds concurrently
+
+        The first crossword meeting the word count or density target is returned and the
+        other generations are cancelled. When the time budget runs out first, the crossword
+        with the most words (then the highest density) found so far is returned.
+
+        Args:
+            shape (Tuple[int, int]): Shape of the puzzle (lines, rows)
+            lang_from (str): Language code for the vocabulary to use for clues and words
+            n_words (int): Number of words to include in the crossword
+            seeds (Iterable[int], optional): Seeds to race, the same seeds give the same race. Defaults to one fresh seed per worker process drawn from the racer seed.
+            target_words (int, optional): Number of words making a crossword good enough. Defaults to `n_words` when no density target is given.
+            target_density (float, optional): Fraction of covered cells making a crossword good enough. Defaults to None.
+            time_budget (float, optional): Seconds allowed to the race. Defaults to no limit.
+            **kwargs: Other `CrosswordGenerator.generate` arguments
+
+        Returns:
+            Crossword: The winning crossword, flagged as truncated when its generation was stopped
+        """
+        self.__wait_pending()
+        self.cancel_event.clear()
+
+        if seeds is None:
+            # Every race draws new seeds, racing the same config twice gives different crosswords
+            seeds = self.seed_sequence.spawn(1)[0].generate_state(self.processes)
+        seeds = [int(seed) for seed in seeds]
+        if target_words is None and target_density is None:
+            target_words = n_words
+        deadline = None if time_budget is None else time.time() + time_budget
+
+        args = (shape, lang_from, n_words)
+        self.pending = self.pool.imap_unordered(
+            _generate, [(seed, deadline, self.style, args, kwargs) for seed in seeds]
+        )
+
+        best_seed, best = None, None
+        for _ in seeds:
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            try:
+                seed, crossword = self.pending.next(timeout)
+            except multiprocessing.TimeoutError:
+                break
+
+            score = (len(crossword.words), density(crossword))
+            if best is None or score > (len(best.words), density(best)):
+                best_seed, best = seed, crossword
+
+            if (target_words is not None and score[0] >= target_words) or (
+                target_density is not None and score[1] >= target_density
+            ):
+                break
+
+        self.cancel_event.set()
+        if best is None:
+            # No generation finished by the deadline, they all stop at their next placement
+            best_seed, best = self.pending.next()
+
+        logger.debug(f"Seed {best_seed} won the race with {len(best.words)} words")
+        return best
+
+
+def tile_origins(size: int, tile: int, overlap: int) -> List[int]:
+    """Starts of the tiles covering a grid dimension, consecutive tiles share `overlap` cells"""
+    stride = max(tile - overlap, 1)
+    return list(range(0, max(size - tile, 0) + stride, stride))
+
+
+def _generate_tile(
+    task: Tuple[int, float, CrosswordStyle, WordGrid, str, int, dict]
+) -> Tuple[List[Word], bool]:
+    seed, deadline, style, window, lang_from, n_words, kwargs = task
+    time_budget = None if deadline is None else max(deadline - time.time(), 0)
+    crossword = WORKER_GENERATORS[style].generate(
+        tuple(window.puzzle.shape),
+        lang_from,
+        n_words,
+        time_budget=time_budget,
+        cancel_event=WORKER_STATE["cancel_event"],
+        seed=seed,
+        fetch_clues=False,
+        word_grid=window,
+        **kwargs,
+    )
+    return crossword.words, crossword.truncated
+
+
+def merge_tile(
+    word_grid: WordGrid,
+    words: List[Word],
+    tile_words: List[Word],
+    origin: Tuple[int, int],
+    mode: ValidationMode,
+    used: Set[str],
+) -> int:
+    """Adds the words of a tile to the full grid, validated against the words of the other tiles
+
+    Args:
+        word_grid (WordGrid): Full grid
+        words (List[Word]): Words of the full grid, extended with the merged words
+        tile_words (List[Word]): Words placed in the tile, positioned relatively to the tile
+        origin (Tuple[int, int]): Row and column of the tile in the full grid
+        mode (ValidationMode): Validation of the words crossing or touching the tile borders
+        used (Set[str]): Words already in the grid, extended with the merged words
+
+    Returns:
+        int: Number of words rejected at the seams or as duplicates of other tiles
+    """
+    rejected = 0
+    for word in tile_words:
+        position = (word.position[0] + origin[1], word.position[1] + origin[0])
+        if word in used or not word_grid.validate_word(position, word.direction, word, mode):
+            rejected += 1
+            continue
+
+        word_grid.add_word(position, word.direction, word)
+        words.append(Word(str(word), position, word.direction, word.id, word.language_code))
+        used.add(word)
+    return rejected
+
+
+class TiledGenerator(WorkerPool):
+    """Pool of worker processes filling overlapping tiles of a large grid in parallel
+
+    The tiles are filled in four phases of a 2x2 pattern, the tiles of a phase do not
+    overlap and are generated concurrently. Each tile starts from the letters placed in
+    its window by the earlier phases, then its words are validated against the full grid
+    and the ones breaking a seam are dropped.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/words.db",
+        languages: List[str] = None,
+        style: CrosswordStyle = CrosswordStyle.AMERICAN,
+        processes: int = None,
+        word2vec_models: Dict[str, str] = None,
+        mp_context: str = "spawn",
+    ) -> None:
+        """
+        Args:
+            db_path (str, optional): Path of the word index. Defaults to "data/words.db".
+            languages (List[str], optional): Languages loaded by the workers. Defaults to all languages.
+            style (CrosswordStyle, optional): Style of the crosswords. Defaults to CrosswordStyle.AMERICAN.
+            processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            word2vec_models (Dict[str, str], optional): Word2Vec model path per language used for themes. Defaults to WORD2VEC_MODELS.
+            mp_context (str, optional): Multiprocessing start method. Defaults to "spawn".
+        """
+        super().__init__(db_path, languages, processes, word2vec_models, mp_context)
+        self.style = style
+        self.validation = ValidationMode.SOFT if style == CrosswordStyle.BRITISH else ValidationMode.HARD
+        # Clues of the merged crosswords are fetched by this process
+        self.word_index = WordIndex(db_path)
+
+    def generate(
+        self,
+        shape: Tuple[int, int],
+        lang_from: str,
+        n_words: int,
+        tile_shape: Tuple[int, int] = (12, 12),
+        overlap: int = 3,
+        seed: int = None,
+        time_budget: float = None,
+        fetch_clues: bool = True,
+        **kwargs,
+    ) -> Crossword:
+        """Generates a large crossword tile by tile
+
+        Args:
+            shape (Tuple[int, int]): Shape of the puzzle (lines, rows)
+            lang_from (str): Language code for the vocabulary to use for clues and words
+            n_words (int): Number of words to include in the crossword, split between the tiles (result may contain less)
+            tile_shape (Tuple[int, int], optional): Shape of the tiles, smaller tiles at the bottom and right borders. Defaults to (12, 12).
+            overlap (int, optional): Lines and rows shared by neighbouring tiles, where words of a tile cross the words of the previous phases. Defaults to 3.
+            seed (int, optional): Random seed of the crossword. Defaults to a random seed.
+            time_budget (float, optional): Seconds allowed to the whole generation, the crossword is flagged as truncated when a tile runs out of time. Defaults to no limit.
+            fetch_clues (bool, optional): Whether or not to fetch the clues. Defaults to True.
+            **kwargs: Other `CrosswordGenerator.generate` arguments
+
+        Returns:
+            Crossword: The merged crossword
+        """
+        self.cancel_event.clear()
+        deadline = None if time_budget is None else time.time() + time_budget
+        rows = tile_origins(shape[0], tile_shape[0], overlap)
+        cols = tile_origins(shape[1], tile_shape[1], overlap)
+        tiles = list(product(range(len(rows)), range(len(cols))))
+        seeds = np.random.SeedSequence(seed).generate_state(len(tiles))
+        tile_words = -(-n_words // len(tiles))
+
+        word_grid = WordGrid(shape)
+        words, used = [], set()
+        truncated = False
+        rejected = 0
+        for phase in product(range(2), range(2)):
+            # Tiles two steps apart do not overlap as long as the overlap is under half a tile
+            phase_tiles = [(t, (rows[i], cols[j])) for t, (i, j) in enumerate(tiles) if (i % 2, j % 2) == phase]
+            tasks = []
+            for t, (row, col) in phase_tiles:
+                window = (slice(row, row + tile_shape[0]), slice(col, col + tile_shape[1]))
+                tile_grid = WordGrid(word_grid.puzzle[window].shape)
+                tile_grid.puzzle[:] = word_grid.puzzle[window]
+                tile_grid.state[:] = word_grid.state[window]
+                tasks.append((int(seeds[t]), deadline, self.style, tile_grid, lang_from, tile_words, kwargs))
+
+            # Merged in tile order whatever the completion order, a seed always gives the same grid
+            for (_, origin), (placed, tile_truncated) in zip(phase_tiles, self.pool.map(_generate_tile, tasks)):
+                truncated |= tile_truncated
+                rejected += merge_tile(word_grid, words, placed, origin, self.validation, used)
+
+        logger.debug(f"Merged {len(words)} words from {len(tiles)} tiles, {rejected} rejected at the seams")
+        return Crossword(
+            word_grid,
+            words,
+            lang_from,
+            kwargs.get("clues_mode", CluesMode.DEFINITION),
+            truncated=truncated,
+            rng=np.random.default_rng(seeds[0]),
+            fetch_clues=fetch_clues,
+        )
@@ -0,0 +1,492 @@
+from collections import defaultdict
+import json
+import multiprocessing
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+from invoke import task
+from loguru import logger
+import numpy as np
+from tabulate import tabulate
+
+from crossword import CluesMode, Crossword, CrosswordGenerator, CrosswordStyle, ThemeMode
+from fingerprint import FINGERPRINT_INDEX, FingerprintIndex
+from metrics import Metrics
+from words import WordIndex
+
+# Default location of the pre-generated puzzles
+PUZZLE_POOL = "data/puzzles.db"
+
+POOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS puzzles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    created REAL NOT NULL,
+    -- Crossword.to_dict() as JSON
+    puzzle TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS puzzles_key ON puzzles (key, id);
+"""
+
+# Consecutive failed or duplicate generations after which a key is no longer refilled
+MAX_ATTEMPTS = 20
+# Seconds before retrying a key after a failed or duplicate generation, doubled on each consecutive one
+RETRY_DELAY = 0.1
+MAX_RETRY_DELAY = 10.0
+
+
+class PuzzleKey(NamedTuple):
+    """Generation parameters shared by interchangeable puzzles"""
+
+    shape: Tuple[int, int]
+    lang_from: str
+    lang_to: str = None
+    clues_mode: CluesMode = CluesMode.DEFINITION
+    style: CrosswordStyle = CrosswordStyle.AMERICAN
+    theme: str = None
+    theme_mode: ThemeMode = ThemeMode.WORD2VEC
+
+    @property
+    def name(self) -> str:
+        """Stable text form of the key used by the store, e.g. `8x8/en/de/translation/american/-`"""
+        theme = f"{self.theme_mode.name.lower()}:{self.theme}" if self.theme else "-"
+        return "/".join(
+            [
+                "x".join(map(str, self.shape)),
+                self.lang_from,
+                self.lang_to or "-",
+                self.clues_mode.name.lower(),
+                self.style.name.lower(),
+                theme,
+            ]
+        )
+
+
+class PuzzleStore:
+    """SQLite queue of finished puzzles per key, safe to share between threads and processes"""
+
+    def __init__(self, path: str = PUZZLE_POOL) -> None:
+        """
+        Args:
+            path (str, optional): Path of the store. Defaults to PUZZLE_POOL.
+        """
+        # Transactions are explicit so that a puzzle is only served once across processes
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(POOL_SCHEMA)
+        self.lock = threading.Lock()
+
+    def put(self, key: str, puzzle: dict) -> None:
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO puzzles (key, created, puzzle) VALUES (?, ?, ?)",
+                (key, time.time(), json.dumps(puzzle)),
+            )
+
+    def pop(self, key: str) -> dict:
+        """Removes and returns the oldest puzzle of a key, None when there is none"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT id, puzzle FROM puzzles WHERE key = ? ORDER BY id LIMIT 1", (key,)
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute("DELETE FROM puzzles WHERE id = ?", (row[0],))
+            finally:
+                self.conn.execute("COMMIT")
+
+        return None if row is None else json.loads(row[1])
+
+    def count(self, key: str) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM puzzles WHERE key = ?", (key,)).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of stored puzzles per key"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT key, COUNT(*) FROM puzzles GROUP BY key"))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# Generators of a worker process per crossword style, set by `init_worker`
+WORKER_GENERATORS = {}
+# Other state of a worker process, set by `init_worker`
+WORKER_STATE = {}
+
+
+def init_worker(
+    db_path: str, languages: List[str], word2vec_models: Dict[str, str], cancel_event=None
+) -> None:
+    """Initializer of generation worker processes, loads the word index once per worker
+
+    Args:
+        db_path (str): Path of the word index
+        languages (List[str]): Languages loaded by the worker, all languages when None
+        word2vec_models (Dict[str, str]): Word2Vec model path per language used for themes
+        cancel_event (optional): Event stopping the generations of the worker at their next placement. Defaults to None.
+    """
+    # Placement traces are too verbose for workers generating many puzzles
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+    # Clues use the same WordIndex instance
+    word_index = WordIndex(db_path).get_data(languages, eligible_only=True)
+    for style in CrosswordStyle:
+        # Seeded from OS entropy, workers and restarts never replay the same streams
+        WORKER_GENERATORS[style] = CrosswordGenerator(word_index, style, None, word2vec_models)
+    WORKER_STATE["cancel_event"] = cancel_event
+
+
+class WorkerPool:
+    """Pool of generation worker processes initialized by `init_worker`, terminated on close"""
+
+    def __init__(
+        self,
+        db_path: str = "data/words.db",
+        languages: List[str] = None,
+        processes: int = None,
+        word2vec_models: Dict[str, str] = None,
+        mp_context: str = "spawn",
+    ) -> None:
+        """
+        Args:
+            db_path (str, optional): Path of the word index. Defaults to "data/words.db".
+            languages (List[str], optional): Languages loaded by the workers. Defaults to all languages.
+            processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            word2vec_models (Dict[str, str], optional): Word2Vec model path per language used for themes. Defaults to WORD2VEC_MODELS.
+            mp_context (str, optional): Multiprocessing start method. Defaults to "spawn".
+        """
+        context = multiprocessing.get_context(mp_context)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.cancel_event = context.Event()
+        self.pool = context.Pool(
+            self.processes,
+            initializer=init_worker,
+            initargs=(db_path, languages, word2vec_models, self.cancel_event),
+        )
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.pool.terminate()
+        self.pool.join()
+
+
+def generate_key(key: PuzzleKey, n_words: int, **kwargs) -> Crossword:
+    """Generates a crossword of a key with the generators of a worker process, see `init_worker`
+
+    Args:
+        key (PuzzleKey): Generation parameters of the crossword
+        n_words (int): Number of words to include in the crossword
+        **kwargs: Other `CrosswordGenerator.generate` arguments, e.g. `time_budget` or `seed`
+    """
+    return WORKER_GENERATORS[key.style].generate(
+        key.shape,
+        key.lang_from,
+        n_words,
+        lang_to=key.lang_to,
+        theme=key.theme,
+        theme_mode=key.theme_mode,
+        clues_mode=key.clues_mode,
+        **kwargs,
+    )
+
+
+def _generate_puzzle(key: PuzzleKey, n_words: int, time_budget: float, seed: int) -> Tuple[dict, float]:
+    start = time.perf_counter()
+    crossword = generate_key(key, n_words, time_budget=time_budget, seed=seed)
+    return crossword.to_dict(), time.perf_counter() - start
+
+
+class PuzzlePool(WorkerPool):
+    """Keeps an inventory of pre-generated puzzles per key, refilled by background worker processes
+
+    Serving a puzzle is a single SQLite query, generation only happens in the
+    workers as the inventory runs below its target.
+    """
+
+    def __init__(
+        self,
+        targets: Dict[PuzzleKey, int],
+        db_path: str = "data/words.db",
+        path: str = PUZZLE_POOL,
+        n_words: int = 12,
+        time_budget: float = None,
+        processes: int = None,
+        word2vec_models: Dict[str, str] = None,
+        seed: int = None,
+        fingerprints: str = None,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> None:
+        """
+        Args:
+            targets (Dict[PuzzleKey, int]): Number of puzzles to keep in stock per key
+            db_path (str, optional): Path of the word index. Defaults to "data/words.db".
+            path (str, optional): Path of the puzzle store. Defaults to PUZZLE_POOL.
+            n_words (int, optional): Number of words per puzzle. Defaults to 12.
+            time_budget (float, optional): Seconds allowed to each generation. Defaults to no limit.
+            processes (int, optional): Number of refill worker processes. Defaults to the number of CPUs.
+            word2vec_models (Dict[str, str], optional): Word2Vec model path per language used for themes. Defaults to WORD2VEC_MODELS.
+            seed (int, optional): Random seed of the generations. Defaults to a random seed.
+            fingerprints (str, optional): Path of the fingerprint index rejecting puzzles generated before. Defaults to no deduplication.
+            max_attempts (int, optional): Consecutive failed or duplicate generations after which a key is dropped from the refills. Defaults to MAX_ATTEMPTS.
+        """
+        languages = sorted(
+            {key.lang_from for key in targets} | {key.lang_to for key in targets if key.lang_to}
+        )
+        super().__init__(db_path, languages, processes, word2vec_models)
+        self.targets = targets
+        self.store = PuzzleStore(path)
+        self.fingerprints = None if fingerprints is None else FingerprintIndex(fingerprints)
+        self.n_words = n_words
+        self.time_budget = time_budget
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.max_attempts = max_attempts
+
+        self.lock = threading.Lock()
+        self.in_flight = defaultdict(int)
+        # Consecutive failed or duplicate generations per key, reset by a stored puzzle
+        self.setbacks = defaultdict(int)
+        self.retry_at = {}
+        self.dropped = set()
+        self.metrics = defaultdict(Metrics)
+        self.started = time.perf_counter()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.__refill, name="puzzle-pool-refill", daemon=True)
+
+    def __enter__(self) -> "PuzzlePool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.wake.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        super().close()
+        self.store.close()
+        if self.fingerprints is not None:
+            self.fingerprints.close()
+
+    def get(self, key: PuzzleKey) -> dict:
+        """Serves a puzzle of the key from the inventory
+
+        Returns:
+            dict: A `Crossword.to_dict()` result, None when the inventory of the key is empty
+        """
+        puzzle = self.store.pop(key.name)
+        with self.lock:
+            self.metrics[key.name].count("served" if puzzle is not None else "misses")
+        self.wake.set()
+        return puzzle
+
+    def __refill(self) -> None:
+        # Keeps up to two generations per worker queued, lowest relative inventories first
+        while not self.stopped.is_set():
+            self.wake.clear()
+            counts = self.store.counts()
+            now = time.perf_counter()
+            with self.lock:
+                # Keys backing off after failures or duplicates wait for their retry time
+                keys = [
+                    key
+                    for key in self.targets
+                    if key not in self.dropped and self.retry_at.get(key, 0) <= now
+                ]
+                stock = {key: counts.get(key.name, 0) + self.in_flight[key] for key in keys}
+                queued = sum(self.in_flight.values())
+                retry = min(
+                    (at for key, at in self.retry_at.items() if key not in self.dropped and at > now),
+                    default=now + 1,
+                )
+
+            while keys and queued < 2 * self.processes:
+                key = min(keys, key=lambda key: stock[key] / self.targets[key])
+                if stock[key] >= self.targets[key]:
+                    break
+                self.__submit(key)
+                stock[key] += 1
+                queued += 1
+
+            self.wake.wait(min(max(retry - now, 0), 1))
+
+    def __submit(self, key: PuzzleKey) -> None:
+        seed = int(self.seed_sequence.spawn(1)[0].generate_state(1)[0])
+        with self.lock:
+            self.in_flight[key] += 1
+
+        self.pool.apply_async(
+            _generate_puzzle,
+            (key, self.n_words, self.time_budget, seed),
+            callback=lambda result: self.__store(key, *result),
+            error_callback=lambda error: self.__fail(key, error),
+        )
+
+    def __store(self, key: PuzzleKey, puzzle: dict, seconds: float) -> None:
+        try:
+            if self.fingerprints is not None and not self.fingerprints.add_puzzle(puzzle, key.name):
+                with self.lock:
+                    self.metrics[key.name].count("duplicates")
+                    self.metrics[key.name].timers["generation"] += seconds
+                self.__setback(key)
+                return
+
+            self.store.put(key.name, puzzle)
+            with self.lock:
+                metrics = self.metrics[key.name]
+                metrics.count("refilled")
+                metrics.count("truncated", int(puzzle["truncated"]))
+                metrics.timers["generation"] += seconds
+                self.setbacks[key] = 0
+                self.retry_at.pop(key, None)
+        finally:
+            self.__release(key)
+
+    def __fail(self, key: PuzzleKey, error: BaseException) -> None:
+        with self.lock:
+            self.metrics[key.name].count("failed")
+            # Only the first failure in a row is logged, the others repeat it
+            if self.setbacks[key] == 0:
+                logger.error(f"Puzzle generation failed for {key.name}: {error}")
+        self.__setback(key)
+        self.__release(key)
+
+    def __setback(self, key: PuzzleKey) -> None:
+        # Backs off exponentially from keys that keep failing or repeating puzzles, then drops them
+        with self.lock:
+            self.setbacks[key] += 1
+            setbacks = self.setbacks[key]
+            if setbacks >= self.max_attempts:
+                if key not in self.dropped:
+                    self.dropped.add(key)
+                    logger.warning(f"Dropped {key.name} from the refills after {setbacks} failed or duplicate generations")
+                return
+            self.retry_at[key] = time.perf_counter() + min(RETRY_DELAY * 2 ** (setbacks - 1), MAX_RETRY_DELAY)
+
+    def __release(self, key: PuzzleKey) -> None:
+        # Only released once stored, the refill loop never sees the puzzle missing from both
+        with self.lock:
+            self.in_flight[key] -= 1
+        self.wake.set()
+
+    def stats(self) -> Dict[str, dict]:
+        """Inventory and refill metrics per key
+
+        Returns:
+            Dict[str, dict]: Target, inventory, queued generations, counters, rate of duplicate generations, consecutive failed or duplicate generations, whether the key was dropped from the refills, refill rate (puzzles/s) and mean generation time (s) per key name
+        """
+        counts = self.store.counts()
+        elapsed = time.perf_counter() - self.started
+        stats = {}
+        for key, target in self.targets.items():
+            metrics = self.metrics[key.name]
+            refilled = metrics.counters["refilled"]
+            duplicates = metrics.counters["duplicates"]
+            generated = refilled + duplicates
+            stats[key.name] = {
+                "target": target,
+                "inventory": counts.get(key.name, 0),
+                "in_flight": self.in_flight[key],
+                "served": metrics.counters["served"],
+                "misses": metrics.counters["misses"],
+                "refilled": refilled,
+                "truncated": metrics.counters["truncated"],
+                "failed": metrics.counters["failed"],
+                "duplicates": duplicates,
+                "dedup_rate": duplicates / generated if generated else 0.0,
+                "setbacks": self.setbacks[key],
+                "dropped": key in self.dropped,
+                "refill_rate": refilled / elapsed,
+                "generation_s": metrics.timers["generation"] / generated if generated else None,
+            }
+        return stats
+
+    def wait_full(self, timeout: float = None) -> bool:
+        """Waits until every key reaches its target inventory or is dropped from the refills
+
+        Returns:
+            bool: Whether the pool is full, False when a key was dropped or the timeout runs out first
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            counts = self.store.counts()
+            with self.lock:
+                dropped = set(self.dropped)
+            if all(
+                key in dropped or counts.get(key.name, 0) >= target for key, target in self.targets.items()
+            ):
+                return not dropped
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(0.1)
+
+
+@task
+def fill_puzzle_pool(
+    ctx,
+    shapes="8x8",
+    lang_from="en",
+    lang_to="",
+    clues_modes="definition",
+    styles="american",
+    target=10,
+    n_words=12,
+    time_budget=0.0,
+    processes=0,
+    db_path="data/words.db",
+    path=PUZZLE_POOL,
+    fingerprints=FINGERPRINT_INDEX,
+):
+    """Fills the puzzle pool up to its target inventory for every combination of parameters
+
+    Args:
+        shapes (str, optional): Comma separated grid shapes. Defaults to "8x8".
+        lang_from (str, optional): Language of the clues. Defaults to "en".
+        lang_to (str, optional): Language of the words. Defaults to lang_from.
+        clues_modes (str, optional): Comma separated clues modes. Defaults to "definition".
+        styles (str, optional): Comma separated crossword styles. Defaults to "american".
+        target (int, optional): Puzzles to keep per key. Defaults to 10.
+        n_words (int, optional): Words to place per puzzle. Defaults to 12.
+        time_budget (float, optional): Seconds allowed to each generation. Defaults to no limit.
+        processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        db_path (str, optional): Path of the word index. Defaults to "data/words.db".
+        path (str, optional): Path of the puzzle store. Defaults to PUZZLE_POOL.
+        fingerprints (str, optional): Path of the fingerprint index, empty to keep duplicates. Defaults to FINGERPRINT_INDEX.
+    """
+    targets = {
+        PuzzleKey(
+            tuple(map(int, shape.split("x"))),
+            lang_from,
+            lang_to or None,
+            CluesMode[clues_mode.upper()],
+            CrosswordStyle[style.upper()],
+        ): target
+        for shape in shapes.split(",")
+        for clues_mode in clues_modes.split(",")
+        for style in styles.split(",")
+    }
+
+    with PuzzlePool(
+        targets, db_path, path, n_words, time_budget or None, processes or None, fingerprints=fingerprints or None
+    ) as pool:
+        if not pool.wait_full():
+            logger.warning("Some keys were dropped from the refills, see the dropped column")
+        print(tabulate([{"key": key, **stats} for key, stats in pool.stats().items()], headers="keys", floatfmt=".3f"))
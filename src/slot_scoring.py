@@ -0,0 +1,116 @@
+from typing import List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from word_grid import Direction, WordGrid
+
+# Cells after a start position considered for crossings
+SLOT_WINDOW = 5
+CROSSING_WEIGHT = 4.0
+DENSITY_WEIGHT = 0.5
+# Score of the positions no word can start at, still tried eventually to be removed
+BLOCKED_SCORE = 0.01
+
+
+def _block(array: np.ndarray, rows: Tuple[int, int], cols: Tuple[int, int]) -> np.ndarray:
+    """Copy of `array[rows, cols]`, zero outside of the array"""
+    (r0, r1), (c0, c1) = rows, cols
+    height, width = array.shape
+    block = np.zeros((r1 - r0, c1 - c0), dtype=np.int16)
+    block[max(-r0, 0) : min(r1, height) - r0, max(-c0, 0) : min(c1, width) - c0] = array[
+        max(r0, 0) : min(r1, height), max(c0, 0) : min(c1, width)
+    ]
+    return block
+
+
+def _window_sums(block: np.ndarray, window: Tuple[int, int]) -> np.ndarray:
+    return sliding_window_view(block, window).sum(axis=(-2, -1))
+
+
+class SlotScorer:
+    """Scores of the start positions of a grid in both directions, from the letters around them
+
+    The score of a slot grows with the letters of the other direction in its first
+    `window` cells, which a word there could cross, and with the letters around it.
+    Scores only depend on `WordGrid.state`, they are computed with windowed sums over
+    the state and only recomputed around the words added since.
+    """
+
+    def __init__(
+        self,
+        word_grid: WordGrid,
+        window: int = SLOT_WINDOW,
+        crossing_weight: float = CROSSING_WEIGHT,
+        density_weight: float = DENSITY_WEIGHT,
+    ) -> None:
+        """
+        Args:
+            word_grid (WordGrid): Grid to score, not flipped
+            window (int, optional): Cells after a start position considered for crossings. Defaults to SLOT_WINDOW.
+            crossing_weight (float, optional): Score of each potential crossing. Defaults to CROSSING_WEIGHT.
+            density_weight (float, optional): Score of each letter around the slot. Defaults to DENSITY_WEIGHT.
+        """
+        self.word_grid = word_grid
+        self.window = window
+        self.crossing_weight = crossing_weight
+        self.density_weight = density_weight
+        shape = tuple(word_grid.puzzle.shape)
+        self.scores = {
+            Direction.DOWN: np.ones(shape),
+            Direction.ACROSS: np.ones(shape),
+        }
+        for direction in self.scores:
+            self.__score(direction, (0, shape[0]), (0, shape[1]))
+
+    def __score(self, direction: Direction, rows: Tuple[int, int], cols: Tuple[int, int]) -> None:
+        # Across slots are down slots of the transposed grid
+        state = self.word_grid.state
+        if direction == Direction.ACROSS:
+            state, rows, cols = state.T, cols, rows
+        (r0, r1), (c0, c1) = rows, cols
+        if r0 >= r1 or c0 >= c1:
+            return
+
+        window = self.window
+        # Cells seen by the slots of the region, from one before their start to one after their window
+        block = _block(state, (r0 - 1, r1 + window), (c0 - 1, c1 + 1))
+        crossable = (block & Direction.flip(direction).value != 0) & (block & direction.value == 0)
+        crossings = _window_sums(crossable[1:-1, 1:-1], (window, 1))
+        density = _window_sums(block != 0, (window + 2, 3))
+        scores = 1.0 + self.crossing_weight * crossings + self.density_weight * density
+        # No word can start after a letter or on a letter of the same direction, whatever comes next
+        blocked = (block[:-window - 1, 1:-1] != 0) | (block[1:-window, 1:-1] & direction.value != 0)
+        scores[blocked] = BLOCKED_SCORE
+
+        if direction == Direction.ACROSS:
+            self.scores[direction][c0:c1, r0:r1] = scores.T
+        else:
+            self.scores[direction][r0:r1, c0:c1] = scores
+
+    def update(self, position: tuple, direction: Direction, length: int) -> None:
+        """Rescores the slots whose surroundings contain a word added to the grid
+
+        Args:
+            position (tuple): Position of the word (column, row)
+            direction (Direction): Direction of the word
+            length (int): Length of the word
+        """
+        x, y = position
+        x1, y1 = (x, y + length - 1) if direction == Direction.DOWN else (x + length - 1, y)
+        rows, cols = self.scores[Direction.DOWN].shape
+        self.__score(
+            Direction.DOWN,
+            (max(y - self.window, 0), min(y1 + 2, rows)),
+            (max(x - 1, 0), min(x1 + 2, cols)),
+        )
+        self.__score(
+            Direction.ACROSS,
+            (max(y - 1, 0), min(y1 + 2, rows)),
+            (max(x - self.window, 0), min(x1 + 2, cols)),
+        )
+
+    def weights(self, direction: Direction, positions: List[tuple]) -> np.ndarray:
+        """Scores of start positions (column, row) of a direction"""
+        x, y = np.array(positions).reshape(-1, 2).T
+        return self.scores[direction][y, x]
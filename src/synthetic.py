@@ -0,0 +1,159 @@
+import json
+import os
+import random
+import string
+from typing import Dict, List, Tuple
+
+# Parts of speech of the synthetic words, `name` entries exercise the index filters
+POSITIONS = ["noun", "verb", "adj", "adv", "name"]
+
+
+def synthetic_vocabulary(
+    lang_code: str, n_words: int, seed: int = 0
+) -> List[Tuple[str, str]]:
+    """Builds a deterministic vocabulary for a language
+
+    Args:
+        lang_code (str): Language code of the vocabulary
+        n_words (int): Number of words to create
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        List[Tuple[str, str]]: (word, part of speech) pairs, the part of speech of word `i` is `POSITIONS[i % len(POSITIONS)]`
+    """
+    rng = random.Random(f"{seed}-{lang_code}")
+    vocabulary = []
+    seen = set()
+    while len(vocabulary) < n_words:
+        length = min(int(rng.expovariate(1 / 4)) + 3, 15)
+        word = "".join(rng.choices(string.ascii_lowercase, k=length))
+
+        # A few multi-word and hyphenated entries like the real dump
+        if rng.random() < 0.03:
+            word += rng.choice([" ", "-", "'"]) + word[::-1]
+
+        if word in seen:
+            continue
+        seen.add(word)
+        vocabulary.append((word, POSITIONS[len(vocabulary) % len(POSITIONS)]))
+
+    return vocabulary
+
+
+def generate_wiktextract(
+    data_dir: str,
+    n_words: int,
+    languages: List[str] = ("en", "de", "fr", "es"),
+    n_senses: int = 2,
+    n_translations: int = 2,
+    n_synonyms: int = 1,
+    n_categories: int = 2,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """Writes wiktextract-shaped `<lang>-extract.jsonl` dumps and `*-words.json` frequency files
+
+    Args:
+        data_dir (str): Directory to write the files to
+        n_words (int): Number of words per language
+        languages (List[str], optional): Language codes to generate. Defaults to ("en", "de", "fr", "es").
+        n_senses (int, optional): Senses per word. Defaults to 2.
+        n_translations (int, optional): Translations per word and target language. Defaults to 2.
+        n_synonyms (int, optional): Synonyms per word. Defaults to 1.
+        n_categories (int, optional): Categories per word. Defaults to 2.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        Dict[str, int]: Number of records written per language
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    rng = random.Random(seed)
+    vocabularies = {
+        lang_code: synthetic_vocabulary(lang_code, n_words, seed)
+        for lang_code in languages
+    }
+    categories = [f"Topic {i}" for i in range(max(n_words // 50, 1))]
+    n_pos = len(POSITIONS)
+
+    def same_position_indices(index: int, k: int) -> List[int]:
+        # Translations and synonyms are matched by part of speech during ingestion
+        candidates = range(index % n_pos, n_words, n_pos)
+        return rng.sample(candidates, min(k, len(candidates)))
+
+    records = {}
+    for lang_code, vocabulary in vocabularies.items():
+        extract_path = os.path.join(data_dir, f"{lang_code}-extract.jsonl")
+        with open(extract_path, "w", encoding="utf-8") as file:
+            for index, (word, position) in enumerate(vocabulary):
+                data = {
+                    "word": word,
+                    "lang_code": lang_code,
+                    "pos": position,
+                    "senses": [
+                        {"glosses": [f"{word} sense {sense} " + " ".join(rng.choice(vocabulary)[0] for _ in range(6))]}
+                        for sense in range(n_senses)
+                    ],
+                    "categories": rng.sample(categories, min(n_categories, len(categories))),
+                    "synonyms": [
+                        {"word": vocabulary[other][0]}
+                        for other in same_position_indices(index, n_synonyms)
+                    ],
+                    "translations": [
+                        {"code": other_code, "word": other_vocabulary[other][0]}
+                        for other_code, other_vocabulary in vocabularies.items()
+                        if other_code != lang_code
+                        for other in same_position_indices(index, n_translations)
+                    ],
+                }
+                file.write(json.dumps(data) + "\n")
+        records[lang_code] = len(vocabulary)
+
+        # Frequency files follow the wortschatz `<lang>_<corpus>/<lang>_<corpus>-words.json` layout
+        corpus_dir = os.path.join(data_dir, f"{lang_code}_synthetic")
+        os.makedirs(corpus_dir, exist_ok=True)
+        frequencies = {
+            word: float(int(rng.paretovariate(1.2) * 10))
+            for word, _ in vocabulary
+        }
+        with open(os.path.join(corpus_dir, f"{lang_code}_synthetic-words.json"), "w", encoding="utf-8") as file:
+            json.dump(frequencies, file)
+
+    return records
+
+
+def generate_sentences(
+    data_dir: str,
+    lang_code: str,
+    n_words: int,
+    n_sentences: int,
+    n_topics: int = 20,
+    seed: int = 0,
+) -> str:
+    """Writes a wortschatz-shaped `*-sentences.txt` corpus over the synthetic vocabulary
+
+    Each sentence only uses words of one topic, word `i` belongs to topic `i % n_topics`,
+    so Word2Vec models trained on it group the words of a topic together.
+
+    Args:
+        data_dir (str): Directory of the synthetic data
+        lang_code (str): Language code of the vocabulary
+        n_words (int): Number of words of the vocabulary
+        n_sentences (int): Number of sentences to write
+        n_topics (int, optional): Number of topics. Defaults to 20.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        str: Path of the corpus file
+    """
+    rng = random.Random(seed)
+    vocabulary = [word for word, _ in synthetic_vocabulary(lang_code, n_words, seed)]
+    topics = [vocabulary[topic::n_topics] for topic in range(n_topics)]
+
+    corpus_dir = os.path.join(data_dir, f"{lang_code}_synthetic")
+    os.makedirs(corpus_dir, exist_ok=True)
+    filename = os.path.join(corpus_dir, f"{lang_code}_synthetic-sentences.txt")
+    with open(filename, "w", encoding="utf-8") as file:
+        for index in range(n_sentences):
+            topic = topics[index % n_topics]
+            file.write(f"{index + 1}\t{' '.join(rng.choices(topic, k=10))}\n")
+
+    return filename
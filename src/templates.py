@@ -0,0 +1,285 @@
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import multiprocessing
+import sqlite3
+from typing import Dict, List, Tuple
+
+from invoke import task
+import numpy as np
+from tabulate import tabulate
+
+from eligibility import MIN_WORD_LEN
+from word_grid import WordGrid, Direction, ValidationMode
+from words import Word
+
+# Default location of the template bank
+TEMPLATE_BANK = "data/templates.db"
+
+TEMPLATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    n_slots INTEGER NOT NULL,
+    -- Fraction of the covered cells shared by an across and a down slot
+    density REAL NOT NULL,
+    -- uint8 (column, row, direction, length) of each slot in placement order
+    slots BLOB NOT NULL,
+    UNIQUE (rows, cols, slots)
+);
+
+CREATE INDEX IF NOT EXISTS templates_shape ON templates (rows, cols, n_slots, density);
+"""
+
+# Crossing densities are bucketed by tenths
+DENSITY_BUCKETS = 10
+
+
+class Template:
+    """Slot geometry of a crossword, filled with words by `place_moves`"""
+
+    def __init__(self, shape: Tuple[int, int], slots: np.ndarray) -> None:
+        """
+        Args:
+            shape (Tuple[int, int]): Shape of the puzzle (lines, rows)
+            slots (np.ndarray): uint8 (column, row, direction, length) of each slot in placement order
+        """
+        self.shape = tuple(shape)
+        self.slots = slots
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def state(self) -> np.ndarray:
+        """Directions of the slots covering each cell, like `WordGrid.state`"""
+        state = np.zeros(self.shape, dtype=np.int8)
+        for x, y, direction, length in self.slots.tolist():
+            if direction == Direction.DOWN.value:
+                state[y : y + length, x] |= direction
+            else:
+                state[y, x : x + length] |= direction
+        return state
+
+    @property
+    def density(self) -> float:
+        state = self.state()
+        covered = (state != 0).sum()
+        crossings = (state == Direction.ACROSS.value | Direction.DOWN.value).sum()
+        return float(crossings / covered) if covered else 0.0
+
+    def moves(self) -> List[Word]:
+        """Placeholder words of the slots for `place_moves`"""
+        return [
+            Word("x" * length, (x, y), Direction(direction))
+            for x, y, direction, length in self.slots.tolist()
+        ]
+
+
+def density_bucket(density: float) -> int:
+    return min(int(density * DENSITY_BUCKETS), DENSITY_BUCKETS - 1)
+
+
+def generate_template(
+    shape: Tuple[int, int],
+    n_slots: int,
+    mode: ValidationMode = ValidationMode.HARD,
+    rng: np.random.Generator = None,
+) -> Template:
+    """Searches a slot layout the way `CrosswordGenerator.generate` places words
+
+    Slots cross each other freely since they have no letters yet, the layout only
+    follows the grid rules of the validation mode.
+
+    Args:
+        shape (Tuple[int, int]): Shape of the puzzle (lines, rows)
+        n_slots (int): Number of slots to place (result may contain less)
+        mode (ValidationMode, optional): Validation of the slot sides. Defaults to ValidationMode.HARD, which keeps layouts fillable with real words.
+        rng (np.random.Generator, optional): Random generator of the layout. Defaults to a freshly seeded one.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    word_grid = WordGrid(shape)
+    positions = {
+        Direction.DOWN: list(product(range(shape[1]), range(shape[0] - MIN_WORD_LEN + 1))),
+        Direction.ACROSS: list(product(range(shape[1] - MIN_WORD_LEN + 1), range(shape[0]))),
+    }
+    direction = [Direction.DOWN, Direction.ACROSS][rng.integers(2)]
+    slots = []
+
+    while len(slots) < n_slots and (positions[Direction.DOWN] or positions[Direction.ACROSS]):
+        if not positions[direction]:
+            direction = Direction.flip(direction)
+
+        position = positions[direction].pop(rng.integers(len(positions[direction])))
+        start = position[1] if direction == Direction.DOWN else position[0]
+        space = (shape[0] if direction == Direction.DOWN else shape[1]) - start
+
+        lengths = [
+            length for length in range(MIN_WORD_LEN, space + 1)
+            if word_grid.validate_word(position, direction, "x" * length, mode)
+        ]
+        if lengths:
+            length = lengths[rng.integers(len(lengths))]
+            word_grid.add_word(position, direction, "x" * length)
+            slots.append((*position, direction.value, length))
+            direction = Direction.flip(direction)
+
+    return Template(shape, np.array(slots, dtype=np.uint8).reshape(-1, 4))
+
+
+def _generate_templates(shape: Tuple[int, int], n_slots: int, count: int, seed: int) -> List[Template]:
+    rng = np.random.default_rng(seed)
+    return [generate_template(shape, n_slots, rng=rng) for _ in range(count)]
+
+
+class TemplateBank:
+    """Persistent templates indexed by shape, slot count and crossing density"""
+
+    def __init__(self, path: str = TEMPLATE_BANK) -> None:
+        """
+        Args:
+            path (str, optional): Path of the bank. Defaults to TEMPLATE_BANK.
+        """
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(TEMPLATE_SCHEMA)
+        self.buckets = None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+
+    def add(self, templates: List[Template]) -> int:
+        """Stores templates, skipping the layouts already in the bank
+
+        Returns:
+            int: Number of new templates
+        """
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO templates (rows, cols, n_slots, density, slots) VALUES (?, ?, ?, ?, ?)",
+            (
+                (*template.shape, len(template), template.density, template.slots.tobytes())
+                for template in templates
+            ),
+        )
+        self.conn.commit()
+        self.buckets = None
+        return self.conn.total_changes - before
+
+    def __load(self) -> Dict[tuple, List[Template]]:
+        # Every template is listed under its exact key and its key without density
+        buckets = defaultdict(list)
+        for rows, cols, n_slots, density, slots in self.conn.execute(
+            "SELECT rows, cols, n_slots, density, slots FROM templates ORDER BY id"
+        ):
+            template = Template((rows, cols), np.frombuffer(slots, dtype=np.uint8).reshape(-1, 4))
+            buckets[(rows, cols, n_slots, density_bucket(density))].append(template)
+            buckets[(rows, cols, n_slots, None)].append(template)
+        return buckets
+
+    def pick(
+        self,
+        shape: Tuple[int, int],
+        n_slots: int,
+        density: float = None,
+        rng: np.random.Generator = None,
+    ) -> Template:
+        """Picks a random template in constant time, the bank is loaded in memory on first use
+
+        Args:
+            shape (Tuple[int, int]): Shape of the puzzle (lines, rows)
+            n_slots (int): Number of slots
+            density (float, optional): Crossing density, matched by tenths. Defaults to any density.
+            rng (np.random.Generator, optional): Random generator of the pick. Defaults to a freshly seeded one.
+
+        Returns:
+            Template: A matching template, None when the bank has none
+        """
+        if self.buckets is None:
+            self.buckets = self.__load()
+
+        bucket = None if density is None else density_bucket(density)
+        templates = self.buckets.get((*shape, n_slots, bucket))
+        if not templates:
+            return None
+
+        rng = rng if rng is not None else np.random.default_rng()
+        return templates[rng.integers(len(templates))]
+
+    def summary(self) -> List[dict]:
+        """Number of templates per shape and slot count"""
+        rows = self.conn.execute(
+            """
+            SELECT rows, cols, n_slots, COUNT(*), AVG(density)
+            FROM templates
+            GROUP BY rows, cols, n_slots
+            """
+        )
+        return [
+            {"shape": f"{r}x{c}", "slots": n_slots, "templates": count, "density": density}
+            for r, c, n_slots, count, density in rows
+        ]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def build_template_bank(
+    path: str,
+    shapes: List[Tuple[int, int]],
+    slot_counts: List[int],
+    count: int,
+    processes: int = None,
+    seed: int = None,
+) -> int:
+    """Generates templates in parallel and stores them in a bank
+
+    Args:
+        path (str): Path of the bank
+        shapes (List[Tuple[int, int]]): Shapes of the templates
+        slot_counts (List[int]): Slots to place per template, smaller layouts are stored with their actual slot count
+        count (int): Templates to generate per shape and slot count
+        processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        seed (int, optional): Random seed. Defaults to a random seed.
+
+    Returns:
+        int: Number of new templates in the bank
+    """
+    configs = list(product(shapes, slot_counts))
+    seeds = np.random.SeedSequence(seed).generate_state(len(configs))
+    bank = TemplateBank(path)
+    added = 0
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(_generate_templates, shape, n_slots, count, int(config_seed))
+            for (shape, n_slots), config_seed in zip(configs, seeds)
+        ]
+        for future in futures:
+            added += bank.add(future.result())
+    bank.close()
+    return added
+
+
+@task
+def build_templates(ctx, shapes="8x8,12x16", slots="8,12,16", count=100, processes=0, path=TEMPLATE_BANK, seed=-1):
+    """Fills the template bank with slot layouts generated offline
+
+    Args:
+        shapes (str, optional): Comma separated grid shapes. Defaults to "8x8,12x16".
+        slots (str, optional): Comma separated slot counts. Defaults to "8,12,16".
+        count (int, optional): Templates per shape and slot count. Defaults to 100.
+        processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        path (str, optional): Path of the bank. Defaults to TEMPLATE_BANK.
+        seed (int, optional): Random seed, negative for a random seed. Defaults to -1.
+    """
+    build_template_bank(
+        path,
+        [tuple(map(int, shape.split("x"))) for shape in shapes.split(",")],
+        [int(n_slots) for n_slots in slots.split(",")],
+        count,
+        processes or None,
+        seed if seed >= 0 else None,
+    )
+
+    bank = TemplateBank(path)
+    print(tabulate(bank.summary(), headers="keys", floatfmt=".2f"))
+    bank.close()
@@ -161,6 +161,16 @@ class WordGrid:
 
         return is_valid
 
+    def place_word(self, position: tuple, direction: Direction, word: str) -> None:
+        """Writes a word without validating it, e.g. to replay placements validated before"""
+        x, y = position
+        if direction == Direction.DOWN:
+            self.puzzle[y : y + len(word), x] = list(word.lower())
+            self.state[y : y + len(word), x] |= direction.value
+        else:
+            self.puzzle[y, x : x + len(word)] = list(word.lower())
+            self.state[y, x : x + len(word)] |= direction.value
+
     def get_letters(self, position: tuple, direction: Direction, length: int):
         do_unflip = False
         if direction == Direction.ACROSS and not self.flipped:
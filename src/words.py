@@ -1,113 +1,492 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import queue
 import sqlite3
-from typing import List, Tuple
+import threading
+import time
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
 from singleton_decorator import singleton
 
+from definition_store import DefinitionStore
 from word_grid import Direction
 
 
 class Word(str):
     """Represents a crossword word placement"""
 
-    def __new__(cls, word: pd.Series, position: Tuple[int, int], direction: Direction):
+    __slots__ = ("id", "language_code", "position", "direction", "_meta")
+
+    def __new__(
+        cls,
+        word: str,
+        position: Tuple[int, int],
+        direction: Direction,
+        word_id: int = None,
+        language_code: str = None,
+    ):
         """
         Args:
-            word (pd.Series): Word data from the Word Index
+            word (str): Text of the word
             position (Tuple[int, int]): Where the word was placed in the grid
             direction (Direction): The direction in which the word was placed
+            word_id (int, optional): Id of the word in the Word Index. Defaults to None.
+            language_code (str, optional): Language of the word. Defaults to None.
 
         Returns:
             Word: A Word object
         """
-        obj = str.__new__(cls, word.word)
-        obj.meta = word
+        obj = str.__new__(cls, word)
+        obj.id = word_id
+        obj.language_code = language_code
         obj.direction = direction
         obj.position = position
+        obj._meta = None
         return obj
 
+    @classmethod
+    def from_row(cls, row: pd.Series, position: Tuple[int, int], direction: Direction):
+        """Creates a placement from a Word Index row"""
+        return cls(row.word, position, direction, int(row.id), row.language_code)
+
+    def __reduce__(self):
+        return (
+            self.__class__,
+            (str(self), self.position, self.direction, self.id, self.language_code),
+        )
+
+    @property
+    def meta(self) -> pd.Series:
+        """Word Index row of the word, loaded on first access"""
+        if self._meta is None:
+            self._meta = WordIndex().get_word_data(self.id, self.language_code)
+        return self._meta
+
+
+# Clue types of the clue cache keys
+DEFINITION_CLUE = "definition"
+SYNONYM_CLUE = "synonym"
+TRANSLATION_CLUE = "translation"
+
+# Languages with a `num_<lang>` translation count column
+TRANSLATION_LANGUAGES = ["en", "de", "fr", "es"]
+
+# Compact dtypes of the index columns, language and position are categorical
+INDEX_DTYPES = {
+    "id": "int32",
+    "source_index": "int32",
+    "length": "int16",
+    "frequency": "float32",
+    "eligible": "bool",
+    "weight": "float32",
+    **{f"num_{lang_code}": "int32" for lang_code in TRANSLATION_LANGUAGES},
+    "num_definitions": "int32",
+    "num_synonyms": "int32",
+}
+
+
+class ClueCache:
+    """Bounded LRU cache of clue lookups with an optional time to live"""
+
+    def __init__(self, maxsize: int = 100_000, ttl: float = None) -> None:
+        """
+        Args:
+            maxsize (int, optional): Maximum number of cached entries. Defaults to 100_000.
+            ttl (float, optional): Seconds before an entry expires. Defaults to never.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # Clues are resolved from several threads by the API
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple):
+        """Returns the cached value of a key, None when missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and entry[1] < time.monotonic():
+                del self.entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, value) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ConnectionPool:
+    """Bounded pool of read-only SQLite connections shared between threads"""
+
+    def __init__(self, db_path: str, size: int = 4) -> None:
+        """
+        Args:
+            db_path (str): Path of the SQLite database
+            size (int, optional): Maximum number of open connections. Defaults to 4.
+        """
+        self.uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        self.size = size
+        self.opened = 0
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection, opened on first use and waited for when all are busy"""
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                can_open = self.opened < self.size
+                self.opened += can_open
+            if can_open:
+                conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            else:
+                conn = self.idle.get()
+
+        try:
+            yield conn
+        finally:
+            self.idle.put(conn)
+
+    def close(self) -> None:
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+        self.opened = 0
+
 
 @singleton
 class WordIndex:
-    def __init__(self) -> None:
-        self.conn = sqlite3.connect("data/words.db")
-        self.index = pd.read_sql("""
+    """Word data of the SQLite index, each language is loaded on first use"""
+
+    def __init__(
+        self,
+        db_path: str = "data/words.db",
+        cache_size: int = 100_000,
+        cache_ttl: float = None,
+        definition_store: str = None,
+        connections: int = 4,
+    ) -> None:
+        """
+        Args:
+            db_path (str, optional): Path of the SQLite index. Defaults to "data/words.db".
+            cache_size (int, optional): Maximum number of cached clue lookups. Defaults to 100_000.
+            cache_ttl (float, optional): Seconds before a cached clue lookup expires. Defaults to never.
+            definition_store (str, optional): Exported definition store to read definitions from instead of SQLite. Defaults to None.
+            connections (int, optional): Maximum number of read-only connections used by the lookups after construction, which can then run in threads. Defaults to 4.
+        """
+        self.conn = sqlite3.connect(db_path)
+        self.connections = ConnectionPool(db_path, connections)
+        self.queries = 0
+        self.clue_cache = ClueCache(cache_size, cache_ttl)
+        self.definition_store = DefinitionStore(definition_store) if definition_store else None
+        self.shards = {}
+        self.translation_pairs = {}
+        self.category_index = None
+
+        languages = [row[0] for row in self.conn.execute("SELECT DISTINCT language_code FROM words")]
+        positions = [row[0] for row in self.conn.execute("SELECT DISTINCT position FROM words")]
+        # Shared categories keep the dtypes when shards are concatenated
+        self.dtypes = dict(
+            INDEX_DTYPES,
+            language_code=pd.CategoricalDtype(sorted(languages)),
+            position=pd.CategoricalDtype(sorted(positions)),
+        )
+
+    @property
+    def languages(self) -> List[str]:
+        """Languages available in the index"""
+        return list(self.dtypes["language_code"].categories)
+
+    @property
+    def index(self) -> pd.DataFrame:
+        return self.get_data()
+
+    def resident_languages(self, eligible_only: bool = False) -> List[str]:
+        """Languages whose shard is loaded in memory
+
+        Args:
+            eligible_only (bool, optional): List the shards of eligible words instead of the full ones. Defaults to False.
+        """
+        return sorted(lang_code for lang_code, eligible in self.shards if eligible == eligible_only)
+
+    def __get_shard(self, lang_code: str, eligible_only: bool) -> pd.DataFrame:
+        key = (lang_code, eligible_only)
+        if key in self.shards:
+            return self.shards[key]
+
+        self.queries += 1
+        # Counts use correlated subqueries, joining all tables at once multiplies them
+        translation_counts = ",".join(
+            f"""
+                (SELECT COUNT(*) FROM translation_pairs p
+                 WHERE p.lang_from = w.language_code AND p.lang_to = '{lang_to}' AND p.word_id = w.id) AS num_{lang_to}"""
+            for lang_to in TRANSLATION_LANGUAGES
+        )
+        query = f"""
             SELECT 
-                w.*,
-                COUNT(CASE WHEN t.word_to_id IN (SELECT id FROM words WHERE language_code = 'en') THEN 1 END) AS num_en,
-                COUNT(CASE WHEN t.word_to_id IN (SELECT id FROM words WHERE language_code = 'de') THEN 1 END) AS num_de,
-                COUNT(CASE WHEN t.word_to_id IN (SELECT id FROM words WHERE language_code = 'fr') THEN 1 END) AS num_fr,
-                COUNT(CASE WHEN t.word_to_id IN (SELECT id FROM words WHERE language_code = 'es') THEN 1 END) AS num_es,
-                COUNT(d.id) AS num_definitions,
-                COUNT(s.synonym_id) AS num_synonyms
+                w.*,{translation_counts},
+                (SELECT COUNT(*) FROM definitions d WHERE d.word_id = w.id) AS num_definitions,
+                (SELECT COUNT(*) FROM synonyms s WHERE s.word_id = w.id) AS num_synonyms
             FROM 
                 words w
-                LEFT JOIN translations t ON w.id = t.word_from_id
-                LEFT JOIN definitions d ON w.id = d.word_id
-                LEFT JOIN synonyms s ON w.id = s.word_id
-            GROUP BY 
+            WHERE
+                w.language_code = ?
+                {"AND w.eligible = 1" if eligible_only else ""}
+            ORDER BY 
                 w.id                    
-        """, self.conn)
+        """
+        with self.connections.connection() as conn:
+            shard = pd.read_sql(query, conn, params=(lang_code,))
+
+        shard = shard.astype({column: dtype for column, dtype in self.dtypes.items() if column in shard})
+        shard.attrs["eligible"] = eligible_only
+        self.shards[key] = shard
+        return shard
+
+    def get_translation_pairs(self, lang_from: str, lang_to: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Translations from one language to another, loaded once per language pair
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Sorted word ids and the aligned translation ids and texts
+        """
+        key = (lang_from, lang_to)
+        if key not in self.translation_pairs:
+            self.queries += 1
+            with self.connections.connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT word_id, translation_id, translation
+                    FROM translation_pairs
+                    WHERE lang_from = ? AND lang_to = ?
+                    ORDER BY word_id
+                    """,
+                    key,
+                ).fetchall()
+            word_ids, translation_ids, translations = zip(*rows) if rows else ((), (), ())
+            self.translation_pairs[key] = (
+                np.array(word_ids, dtype=np.int32),
+                np.array(translation_ids, dtype=np.int32),
+                np.array(translations, dtype=object),
+            )
+
+        return self.translation_pairs[key]
+
+    def get_category_index(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Inverted index of the word categories, loaded once
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Sorted lowercase category names, offsets of each category in the word ids and the word ids
+        """
+        if self.category_index is None:
+            self.queries += 1
+            with self.connections.connection() as conn:
+                categories = pd.read_sql(
+                    """
+                    SELECT c.name, wc.word_id
+                    FROM word_categories wc
+                        JOIN categories c ON wc.category_id = c.id
+                    """,
+                    conn,
+                )
+            categories["name"] = categories.name.str.lower()
+            categories = categories.sort_values(["name", "word_id"])
+            names, starts = np.unique(categories.name.to_numpy(dtype=object), return_index=True)
+            offsets = np.append(starts, len(categories))
+            self.category_index = (names, offsets, categories.word_id.to_numpy(dtype=np.int32))
+
+        return self.category_index
+
+    def get_category_words(self, category: str, prefix: bool = False) -> np.ndarray:
+        """Ids of the words in a category, case insensitive
+
+        Args:
+            category (str): Name of the category
+            prefix (bool, optional): Also include the categories starting with `category`. Defaults to False.
+        """
+        names, offsets, word_ids = self.get_category_index()
+        category = category.lower()
+        start = np.searchsorted(names, category)
+        if prefix:
+            end = np.searchsorted(names, category + "\uffff")
+        else:
+            end = start + 1 if start < len(names) and names[start] == category else start
+
+        return np.unique(word_ids[offsets[start]:offsets[end]])
 
     def get_translation(self, word: Word, lang_to: str) -> List[Word]:
-        translations = pd.read_sql(
-            f"""
-            SELECT 
-                w2.*
-            FROM translations t
-                JOIN words w1 ON t.word_from_id = w1.id
-                JOIN words w2 ON t.word_to_id = w2.id
-            WHERE 
-                w1.id = {word.meta.id}; 
-        """,
-            self.conn,
-        )
+        """Translations of a word in another language, an empty list when there are none"""
+        key = (word.id, TRANSLATION_CLUE, lang_to)
+        clues = self.clue_cache.get(key)
+        if clues is None:
+            word_ids, translation_ids, translations = self.get_translation_pairs(word.language_code, lang_to)
+            start, end = np.searchsorted(word_ids, [word.id, word.id + 1])
+            clues = tuple(zip(translation_ids[start:end].tolist(), translations[start:end]))
+            self.clue_cache.put(key, clues)
 
-        if lang_to not in translations.language_code.tolist():
-            return None
+        return [
+            Word(text, word.position, word.direction, translation_id, lang_to)
+            for translation_id, text in clues
+        ]
 
-        words = []
-        for _, row in translations[translations.language_code == lang_to].iterrows():
-            words.append(Word(row, word.position, word.direction))
+    def __load_clues(self, clue_type: str, word_ids: List[int]) -> Dict[int, tuple]:
+        """Queries the definitions or synonyms of words
 
-        return words
+        Returns:
+            Dict[int, tuple]: Definitions, or (id, word, language code) of the synonyms, of each word id
+        """
+        if clue_type == DEFINITION_CLUE and self.definition_store is not None:
+            return {word_id: tuple(self.definition_store.get(word_id)) for word_id in word_ids}
 
-    def get_definition(self, word: Word) -> List[str]:
-        definitions = pd.read_sql(
-            f"""
-            SELECT d.definition 
-            FROM words w 
-            JOIN definitions d ON w.id = d.word_id 
-            WHERE w.id = {word.meta.id};
-        """,
-            self.conn,
-        )
+        self.queries += 1
+        placeholders = ",".join("?" * len(word_ids))
+        if clue_type == DEFINITION_CLUE:
+            sql = f"SELECT word_id, definition FROM definitions WHERE word_id IN ({placeholders})"
+        else:
+            sql = f"""
+                SELECT s.word_id, w.id, w.word, w.language_code
+                FROM synonyms s
+                    JOIN words w ON s.synonym_id = w.id
+                WHERE s.word_id IN ({placeholders})
+            """
 
-        return definitions.definition.to_list()
+        clues = {word_id: [] for word_id in word_ids}
+        with self.connections.connection() as conn:
+            for word_id, *clue in conn.execute(sql, word_ids):
+                clues[word_id].append(clue[0] if clue_type == DEFINITION_CLUE else tuple(clue))
+
+        return {word_id: tuple(word_clues) for word_id, word_clues in clues.items()}
+
+    def __get_clues(self, word: Word, clue_type: str) -> tuple:
+        key = (word.id, clue_type, word.language_code)
+        clues = self.clue_cache.get(key)
+        if clues is None:
+            clues = self.__load_clues(clue_type, [word.id])[word.id]
+            self.clue_cache.put(key, clues)
+
+        return clues
+
+    def get_definition(self, word: Word) -> List[str]:
+        return list(self.__get_clues(word, DEFINITION_CLUE))
 
     def get_synonym(self, word: Word) -> List[Word]:
-        synonyms = pd.read_sql(
-            f"""
-            SELECT w1.word AS original_word,
-            w2.word AS synonym_word
-            FROM 
-            synonyms s
-            JOIN words w1 ON s.word_id = w1.id
-            JOIN words w2 ON s.synonym_id = w2.id
-            WHERE 
-            w1.id = {word.meta.id}; 
-        """,
-            self.conn,
-        )
+        # Clue words share the placement of the word they describe
+        return [
+            Word(text, word.position, word.direction, synonym_id, language_code)
+            for synonym_id, text, language_code in self.__get_clues(word, SYNONYM_CLUE)
+        ]
+
+    def prewarm(self, languages: List[str] = None, top_n: int = 1000, translations_to: List[str] = ()) -> None:
+        """Loads the clues of the most frequent eligible words of each language in the clue cache
+
+        Args:
+            languages (List[str], optional): Languages to prewarm. Defaults to all languages.
+            top_n (int, optional): Number of words per language. Defaults to 1000.
+            translations_to (List[str], optional): Languages to also cache translations to. Defaults to none.
+        """
+        for lang_code in languages or self.languages:
+            with self.connections.connection() as conn:
+                word_ids = [
+                    row[0] for row in conn.execute(
+                        """
+                        SELECT id FROM words
+                        WHERE language_code = ? AND eligible = 1
+                        ORDER BY frequency DESC
+                        LIMIT ?
+                        """,
+                        (lang_code, top_n),
+                    )
+                ]
 
-        words = []
-        for _, row in synonyms.iterrows():
-            words.append(Word(row, word.position, word.direction))
+            # Stay under the SQLite variable limit
+            for start in range(0, len(word_ids), 10000):
+                chunk = word_ids[start:start + 10000]
+                for clue_type in (DEFINITION_CLUE, SYNONYM_CLUE):
+                    for word_id, clues in self.__load_clues(clue_type, chunk).items():
+                        self.clue_cache.put((word_id, clue_type, lang_code), clues)
 
-        return words
+            for lang_to in translations_to:
+                for word_id in word_ids:
+                    self.get_translation(Word("", None, None, word_id, lang_code), lang_to)
 
-    def get_word(self, word: str, lang_code: str):
-        return self.index[self.index.word == word & self.index.lang_code == lang_code]
+    def get_word_data(self, word_id: int, lang_code: str = None) -> pd.Series:
+        """Returns the Word Index row of a word id
+
+        Args:
+            word_id (int): Id of the word
+            lang_code (str, optional): Language of the word, loaded if needed. Defaults to searching the resident languages.
+        """
+        for (shard_lang, _), shard in list(self.shards.items()):
+            if lang_code is None or shard_lang == lang_code:
+                row = self.__find_row(shard, word_id)
+                if row is not None:
+                    return row
+
+        # The full shard is only loaded when the resident shards miss the word
+        if lang_code is not None and (lang_code, False) not in self.shards:
+            row = self.__find_row(self.__get_shard(lang_code, False), word_id)
+            if row is not None:
+                return row
+
+        raise KeyError(f"Unknown word id {word_id}")
+
+    @staticmethod
+    def __find_row(shard: pd.DataFrame, word_id: int) -> pd.Series:
+        # Rows are ordered by id
+        row = shard.id.searchsorted(word_id)
+        if row < len(shard) and shard.id.iat[row] == word_id:
+            return shard.iloc[row]
+        return None
+
+    def get_word(self, word: str, lang_code: str) -> pd.DataFrame:
+        shard = self.__get_shard(lang_code, False)
+        return shard[shard.word == word]
+
+    def get_data(self, languages: List[str] = None, eligible_only: bool = False) -> pd.DataFrame:
+        """
+        Args:
+            languages (List[str], optional): Languages to return, their shards are loaded on first use. Defaults to all languages.
+            eligible_only (bool, optional): Only return the words flagged as crossword eligible during the index build. Defaults to False.
+        """
+        shards = [
+            self.__get_shard(lang_code, eligible_only)
+            for lang_code in languages or self.languages
+        ]
+        if len(shards) == 1:
+            return shards[0]
 
-    def get_data(self) -> pd.DataFrame:
-        return self.index
+        data = pd.concat(shards, ignore_index=True)
+        data.attrs["eligible"] = eligible_only
+        return data
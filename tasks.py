@@ -1,15 +1,30 @@
 from invoke import Collection
 
+import api
+import benchmark
 import data_processing
+import export
+import puzzle_pool
+import templates
 
 
 #data_processing.create_word_index.pre(data_processing.extract_word_frequencies)
 ns = Collection('tasks')
 
+ns.add_task(data_processing.create_word_database, name='database')
 ns.add_task(data_processing.extract_word_frequencies, name='frequency')
 ns.add_task(data_processing.create_word_index, name='index')
+ns.add_task(data_processing.export_definition_store, name='definitions')
 ns.add_task(data_processing.train_word2vec, name='train')
 ns.add_task(data_processing.test_word2vec, name='test')
+ns.add_task(templates.build_templates, name='templates')
+ns.add_task(puzzle_pool.fill_puzzle_pool, name='pool')
+ns.add_task(export.export_puzzles, name='export')
+ns.add_task(api.serve, name='serve')
+ns.add_task(benchmark.benchmark_index, name='bench-index')
+ns.add_task(benchmark.benchmark_generation, name='bench-generation')
+ns.add_task(benchmark.benchmark_api, name='bench-api')
+ns.add_task(benchmark.benchmark_imports, name='bench-imports')
 
 if __name__ == "__main__":
     import invoke
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from benchmark import build_synthetic_index
+from api import CrosswordServer, http_get
+
+
+class TestCrosswordServer(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        data_dir = cls.tmp_dir.name
+        build_synthetic_index(data_dir, 100, ["en", "de"], themed=False, seed=6)
+        cls.server = CrosswordServer(os.path.join(data_dir, "words.db"), ["en", "de"], processes=1, threads=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        cls.tmp_dir.cleanup()
+
+    async def asyncSetUp(self):
+        listener = await self.server.start("127.0.0.1", 0)
+        self.port = listener.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.server.close()
+        await self.server.server.wait_closed()
+
+    async def test_crossword_should_share_one_generation_between_identical_requests(self):
+        # Arrange
+        path = "/crossword?shape=6x6&lang_from=en&lang_to=de&clues_mode=translation&n_words=4&seed=3"
+        generations = self.server.metrics.counters["generations"]
+
+        # Action
+        responses = await asyncio.gather(*[http_get("127.0.0.1", self.port, path) for _ in range(3)])
+
+        # Assert
+        self.assertEqual([200] * 3, [status for status, _ in responses])
+        self.assertEqual(1, len({body for _, body in responses}))
+        crossword = json.loads(responses[0][1])
+        self.assertEqual(len(crossword["words"]), len(crossword["clues"]))
+        self.assertEqual(generations + 1, self.server.metrics.counters["generations"])
+        self.assertEqual(2, self.server.metrics.counters["coalesced"])
+
+    async def test_crossword_should_generate_a_puzzle_per_request_without_seed(self):
+        # Arrange
+        path = "/crossword?shape=6x6&lang_from=en&lang_to=de&clues_mode=translation&n_words=4"
+        generations = self.server.metrics.counters["generations"]
+        coalesced = self.server.metrics.counters["coalesced"]
+
+        # Action
+        responses = await asyncio.gather(*[http_get("127.0.0.1", self.port, path) for _ in range(3)])
+
+        # Assert
+        self.assertEqual([200] * 3, [status for status, _ in responses])
+        self.assertEqual(generations + 3, self.server.metrics.counters["generations"])
+        self.assertEqual(coalesced, self.server.metrics.counters["coalesced"])
+
+    async def test_crossword_should_only_serve_pooled_puzzles_to_requests_matching_the_pool(self):
+        # Arrange
+        path = "/crossword?shape=6x6&lang_from=en&lang_to=de&clues_mode=translation"
+        pool = MagicMock(n_words=12)
+        pool.get.return_value = {"words": ["pooled"]}
+        self.server.pool = pool
+        pool_hits = self.server.metrics.counters["pool_hits"]
+
+        # Action
+        try:
+            _, pooled = await http_get("127.0.0.1", self.port, path)
+            _, other_words = await http_get("127.0.0.1", self.port, path + "&n_words=4")
+            _, other_budget = await http_get("127.0.0.1", self.port, path + "&n_words=12&time_budget=5")
+        finally:
+            self.server.pool = None
+
+        # Assert
+        self.assertEqual({"words": ["pooled"]}, json.loads(pooled))
+        self.assertNotEqual(["pooled"], json.loads(other_words)["words"])
+        self.assertNotEqual(["pooled"], json.loads(other_budget)["words"])
+        self.assertEqual(pool_hits + 1, self.server.metrics.counters["pool_hits"])
+        pool.get.assert_called_once()
+
+    async def test_crossword_steps_should_stream_each_placement_before_the_crossword(self):
+        # Action
+        status, body = await http_get("127.0.0.1", self.port, "/crossword/steps?shape=6x6&lang_from=en&n_words=4&seed=1")
+
+        # Assert
+        *steps, last = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+        self.assertEqual(200, status)
+        self.assertEqual(last["crossword"]["words"], [step["word"] for step in steps])
+        self.assertTrue(all(step["direction"] in ("across", "down") for step in steps))
+
+    async def test_crossword_should_reject_invalid_parameters(self):
+        # Action
+        status, body = await http_get("127.0.0.1", self.port, "/crossword?lang_from=en&clues_mode=riddle")
+
+        # Assert
+        self.assertEqual(400, status)
+        self.assertIn("RIDDLE", json.loads(body)["error"])
@@ -1,12 +1,21 @@
 from io import StringIO
+from itertools import product
+import os
+import random
+import subprocess
+import sys
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
 from loguru import logger
 import pytest
+import numpy as np
 import pandas as pd
 
-from crossword import Crossword, CluesMode, CrosswordGenerator, CrosswordStyle
+from crossword import Crossword, CluesMode, CrosswordGenerator, CrosswordStyle, ThemeMode, place_moves
+from templates import Template
+from word_grid import WordGrid
 from words import Word, Direction
 
 class CrosswordTest(unittest.TestCase):
@@ -67,13 +76,13 @@ class TestCrossword(CrosswordTest):
         self, mock_index: MagicMock
     ):
         # Arrange
-        test_word = Word(self.test_index.iloc[0], (0, 0), Direction.ACROSS)
+        test_word = Word.from_row(self.test_index.iloc[0], (0, 0), Direction.ACROSS)
         test_definitions = [self.test_definitions[0]]
         mock_index.return_value.get_definition.return_value = test_definitions
 
         # Action
         crossword = Crossword(
-            None, [test_word], test_word.meta.language_code, CluesMode.DEFINITION
+            None, [test_word], test_word.language_code, CluesMode.DEFINITION
         )
 
         # Assert
@@ -84,13 +93,13 @@ class TestCrossword(CrosswordTest):
         self, mock_index: MagicMock
     ):
         # Arrange
-        test_word = Word(self.test_index.iloc[1], (0, 0), Direction.ACROSS)
+        test_word = Word.from_row(self.test_index.iloc[1], (0, 0), Direction.ACROSS)
         test_synonyms = [self.test_synonyms[1]]
         mock_index.return_value.get_synonym.return_value = test_synonyms
 
         # Action
         crossword = Crossword(
-            None, [test_word], test_word.meta.language_code, CluesMode.SYNONYM
+            None, [test_word], test_word.language_code, CluesMode.SYNONYM
         )
 
         # Assert
@@ -101,8 +110,8 @@ class TestCrossword(CrosswordTest):
         self, mock_index: MagicMock
     ):
         # Arrange
-        test_word = Word(self.test_index.iloc[2], (0, 0), Direction.ACROSS)
-        test_translation = Word(
+        test_word = Word.from_row(self.test_index.iloc[2], (0, 0), Direction.ACROSS)
+        test_translation = Word.from_row(
             self.test_index.iloc[0], test_word.position, test_word.direction
         )
         mock_index.return_value.get_translation.return_value = [test_translation]
@@ -117,14 +126,14 @@ class TestCrossword(CrosswordTest):
 class TestCrosswordGenerator(CrosswordTest):
 
     def mock_get_definition(self, word: Word):
-        if word.meta.id < len(self.test_definitions):
-            return [self.test_definitions[word.meta.id]]
+        if word.id < len(self.test_definitions):
+            return [self.test_definitions[word.id]]
 
         return None
 
     def mock_get_synonym(self, word: Word):
-        if word.meta.id < len(self.test_synonyms):
-            return [self.test_synonyms[word.meta.id]]
+        if word.id < len(self.test_synonyms):
+            return [self.test_synonyms[word.id]]
 
         return None
     
@@ -136,8 +145,8 @@ class TestCrosswordGenerator(CrosswordTest):
             "fr": 3
         }
         
-        offset = lang_offset[lang_to] - lang_offset[word.meta.language_code]
-        return [Word(self.test_index.iloc[word.meta.id + offset], word.position, word.direction)]
+        offset = lang_offset[lang_to] - lang_offset[word.language_code]
+        return [Word.from_row(self.test_index.iloc[word.id + offset], word.position, word.direction)]
         
     @patch("crossword.WordIndex")
     def test_generate_should_ignore_words_with_no_definitions_when_clues_mode_is_definition(self, mock_index: MagicMock):
@@ -192,4 +201,238 @@ class TestCrosswordGenerator(CrosswordTest):
         self.assertTrue(self.test_index.loc[0, 'word'] in result.words)
         self.assertTrue(self.test_index.loc[4, 'word'] in result.words)
         self.assertTrue(self.test_index.loc[2, 'word'] in result.clues)
-        self.assertTrue(self.test_index.loc[6, 'word'] in result.clues)
\ No newline at end of file
+        self.assertTrue(self.test_index.loc[6, 'word'] in result.clues)
+
+    @patch("crossword.WordIndex")
+    def test_generate_should_only_use_category_words_when_theme_mode_is_category(self, mock_index: MagicMock):
+        # Arrange
+        mock_word_index = MagicMock()
+        mock_word_index.get_definition = self.mock_get_definition
+        mock_word_index.get_category_words.return_value = [1]
+        mock_index.return_value = mock_word_index
+
+        # Action
+        generator = CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 123)
+        result = generator.generate((5,5), "en", 3, theme="Cats", theme_mode=ThemeMode.CATEGORY)
+
+        # Assert
+        self.assertEqual([self.test_index.loc[1, 'word']], result.words)
+        mock_word_index.get_category_words.assert_called_once_with("Cats", prefix=False)
+
+    def test_init_should_not_filter_word_index_already_flagged_as_eligible(self):
+        # Arrange
+        eligible_index = self.test_index.assign(weight=self.test_index.length.astype(float))
+        eligible_index.attrs["eligible"] = True
+
+        # Action
+        generator = CrosswordGenerator(eligible_index, CrosswordStyle.BRITISH, 123)
+
+        # Assert
+        self.assertIs(eligible_index, generator.word_index)
+
+    @patch("crossword.WordIndex")
+    def test_generate_should_attach_metrics_when_collect_metrics_is_enabled(self, mock_index: MagicMock):
+        # Arrange
+        mock_word_index = MagicMock()
+        mock_word_index.get_definition = self.mock_get_definition
+        mock_word_index.queries = 0
+        mock_index.return_value = mock_word_index
+
+        # Action
+        generator = CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 123)
+        result = generator.generate((5,5), "en", 3, collect_metrics=True)
+        unmeasured = generator.generate((5,5), "en", 3)
+
+        # Assert
+        metrics = result.to_dict()["metrics"]
+        self.assertEqual(len(result.words), metrics["counters"]["words_placed"])
+        self.assertGreaterEqual(metrics["counters"]["positions_tried"], len(result.words))
+        self.assertTrue({"dictionary", "validation", "sampling", "add_word", "clues"} <= metrics["timers"].keys())
+        self.assertIsNone(unmeasured.metrics)
+
+    @patch("crossword.WordIndex")
+    def test_generate_should_search_heavier_tiers_first_and_count_their_hits(self, mock_index: MagicMock):
+        # Arrange
+        mock_word_index = MagicMock()
+        mock_word_index.get_definition = self.mock_get_definition
+        mock_word_index.queries = 0
+        mock_index.return_value = mock_word_index
+        self.test_index.loc[5, "frequency"] = 10.0
+
+        # Action
+        generator = CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 123, tier_sizes=(1,))
+        result = generator.generate((5,5), "en", 2, collect_metrics=True)
+
+        # Assert
+        counters = result.metrics.counters
+        self.assertEqual(["cat", "dog"], result.words)
+        self.assertEqual(1, counters["tier_0_hits"])
+        self.assertEqual(1, counters["tier_1_hits"])
+
+    def test_generate_should_share_dictionary_tiers_between_grid_shapes(self):
+        # Arrange
+        generator = CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 123)
+
+        # Action
+        generator.generate((5,5), "en", 2, fetch_clues=False)
+        generator.generate((8,6), "en", 2, fetch_clues=False)
+
+        # Assert
+        self.assertEqual(1, len(generator.tiers))
+
+    def test_generate_should_return_empty_crossword_when_no_word_has_a_translation(self):
+        # Arrange
+        generator = CrosswordGenerator(self.test_index.assign(num_en=0), CrosswordStyle.BRITISH, 123)
+
+        # Action
+        result = generator.generate((5,5), "en", 2, lang_to="de", clues_mode=CluesMode.TRANSLATION)
+
+        # Assert
+        self.assertEqual([], result.words)
+        self.assertEqual([], generator.tiers[("en", "de", CluesMode.TRANSLATION, None, ThemeMode.WORD2VEC)])
+
+    @patch("crossword.WordIndex")
+    def test_generate_should_return_truncated_crossword_when_time_budget_runs_out(self, mock_index: MagicMock):
+        # Arrange
+        mock_word_index = MagicMock()
+        mock_word_index.get_definition = self.mock_get_definition
+        mock_index.return_value = mock_word_index
+        generator = CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 123)
+
+        # Action
+        truncated = generator.generate((5,5), "en", 3, time_budget=0)
+        complete = generator.generate((5,5), "en", 3, time_budget=60)
+
+        # Assert
+        self.assertEqual([], truncated.words)
+        self.assertTrue(truncated.to_dict()["truncated"])
+        self.assertEqual(2, len(complete.words))
+        self.assertFalse(complete.truncated)
+
+    @patch("crossword.WordIndex")
+    def test_generate_should_be_reproducible_without_touching_global_random_state(self, mock_index: MagicMock):
+        # Arrange
+        mock_word_index = MagicMock()
+        mock_word_index.get_definition = self.mock_get_definition
+        mock_index.return_value = mock_word_index
+        python_state = random.getstate()
+        numpy_state = np.random.get_state()[1].copy()
+
+        # Action
+        results = [
+            CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 7).generate((5,5), "en", 2)
+            for _ in range(2)
+        ]
+        seeded = [
+            CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, seed).generate((5,5), "en", 2, seed=3)
+            for seed in (1, 2)
+        ]
+
+        # Assert
+        self.assertEqual(results[0].words, results[1].words)
+        self.assertEqual([word.position for word in results[0].words], [word.position for word in results[1].words])
+        self.assertEqual(results[0].clues, results[1].clues)
+        self.assertEqual([word.position for word in seeded[0].words], [word.position for word in seeded[1].words])
+        self.assertEqual(python_state, random.getstate())
+        self.assertTrue((numpy_state == np.random.get_state()[1]).all())
+
+    @patch("crossword.WordIndex")
+    def test_get_steps_should_replay_each_placement_into_its_grid(self, mock_index: MagicMock):
+        # Arrange
+        mock_word_index = MagicMock()
+        mock_word_index.get_definition = self.mock_get_definition
+        mock_index.return_value = mock_word_index
+        generator = CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 123)
+
+        # Action
+        result = generator.generate((5,5), "en", 3, store_steps=True)
+        steps = generator.get_steps()
+        first_step, first_grid = steps[0]
+
+        # Assert
+        self.assertEqual(len(result.words), len(steps))
+        self.assertEqual(result.words[0], first_step["word"])
+        self.assertEqual(len(result.words[0]), (first_grid.state != 0).sum())
+        self.assertTrue((result.word_grid.puzzle == steps.grid(-1).puzzle).all())
+        *_, (last_step, last_grid) = steps
+        self.assertEqual(result.words[-1].position, last_step["position"])
+        self.assertTrue((result.word_grid.state == last_grid.state).all())
+
+    @patch("crossword.WordIndex")
+    def test_get_steps_should_replay_slices_from_the_initial_grid(self, mock_index: MagicMock):
+        # Arrange
+        mock_word_index = MagicMock()
+        mock_word_index.get_definition = self.mock_get_definition
+        mock_index.return_value = mock_word_index
+        generator = CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 123)
+        word_grid = WordGrid((5, 5))
+        word_grid.place_word((3, 4), Direction.ACROSS, "qq")
+
+        # Action
+        result = generator.generate((5, 5), "en", 3, store_steps=True, word_grid=word_grid)
+        steps = generator.get_steps()
+        sliced = steps[-2:]
+
+        # Assert
+        self.assertGreater(len(steps), 0)
+        self.assertTrue((result.word_grid.puzzle == steps.grid(-1).puzzle).all())
+        self.assertEqual("q", steps.grid(0).puzzle[4, 3])
+        self.assertEqual(min(len(steps), 2), len(sliced))
+        for (step, grid), index in zip(sliced, range(len(steps))[-2:]):
+            self.assertEqual(steps.step(index), step)
+            self.assertTrue((steps.grid(index).state == grid.state).all())
+        with self.assertRaises(TypeError):
+            steps.grid("last")
+
+    @patch("crossword.WordIndex")
+    def test_fill_template_should_fill_crossing_slots_with_matching_letters(self, mock_index: MagicMock):
+        # Arrange
+        mock_word_index = MagicMock()
+        mock_word_index.get_synonym = self.mock_get_synonym
+        mock_index.return_value = mock_word_index
+        slots = np.array([[0, 0, Direction.DOWN.value, 4], [0, 0, Direction.ACROSS.value, 5]], dtype=np.uint8)
+        generator = CrosswordGenerator(self.test_index, CrosswordStyle.BRITISH, 123)
+
+        # Action
+        result = generator.fill_template(Template((5, 5), slots), "fr", clues_mode=CluesMode.SYNONYM, seed=1)
+
+        # Assert
+        self.assertEqual(["chat", "chien"], result.words)
+        self.assertEqual([(0, 0), (0, 0)], [word.position for word in result.words])
+        self.assertEqual([self.test_synonyms[3], self.test_synonyms[7]], result.clues)
+        self.assertFalse(result.truncated)
+
+    def test_place_moves_should_stop_at_the_deadline_while_trying_the_candidates_of_a_step(self):
+        # Arrange
+        words = ["".join(letters) for letters in product("abcdefghij", repeat=4)]
+        len_groups = {4: pd.DataFrame({"id": range(len(words)), "word": words, "language_code": "en"})}
+        # The second move starts right after the first one, none of its candidates can be placed
+        moves = [Word("xxxx", (0, 0), Direction.ACROSS), Word("xxxx", (4, 0), Direction.ACROSS)]
+
+        # Action
+        start = time.perf_counter()
+        placed, _, truncated = place_moves(moves, len_groups, WordGrid((3, 8)), 0.2, np.random.default_rng(0))
+        elapsed = time.perf_counter() - start
+
+        # Assert
+        self.assertTrue(truncated)
+        self.assertEqual(1, len(placed))
+        self.assertLess(elapsed, 1)
+
+
+class TestCrosswordImports(unittest.TestCase):
+
+    def test_import_should_not_load_word2vec_dependencies(self):
+        # Arrange
+        script = "import sys, crossword; print(any(m in sys.modules for m in ['gensim', 'nltk']))"
+
+        # Action
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        )
+
+        # Assert
+        self.assertEqual("False", result.stdout.strip(), result.stderr)
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import data_processing
+from synthetic import generate_wiktextract
+
+
+class TestWordIndexBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp_dir.name
+        self.records = generate_wiktextract(self.data_dir, 50, ["en", "de"], seed=3)
+        data_processing.create_database(self.data_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def query(self, sql: str):
+        conn = sqlite3.connect(os.path.join(self.data_dir, "words.db"))
+        result = conn.execute(sql).fetchall()
+        conn.close()
+        return result
+
+    def test_create_word_index_should_load_all_records_with_their_frequency(self):
+        # Action
+        data_processing.extract_frequencies(self.data_dir)
+        for phase in data_processing.INDEX_PHASES:
+            phase(self.data_dir)
+
+        # Assert
+        [(n_words, n_missing_freq)] = self.query(
+            "SELECT COUNT(*), COUNT(*) - COUNT(frequency) FROM words"
+        )
+        self.assertEqual(sum(self.records.values()), n_words)
+        self.assertEqual(0, n_missing_freq)
+        self.assertGreater(self.query("SELECT COUNT(*) FROM definitions")[0][0], 0)
+        self.assertGreater(self.query("SELECT COUNT(*) FROM synonyms")[0][0], 0)
+        self.assertGreater(self.query("SELECT COUNT(*) FROM translations")[0][0], 0)
+
+    def test_load_eligibility_should_flag_words_that_can_be_placed(self):
+        # Arrange
+        data_processing.extract_frequencies(self.data_dir)
+        data_processing.load_wiktextract(self.data_dir)
+
+        # Action
+        data_processing.load_eligibility(self.data_dir)
+
+        # Assert
+        rows = self.query("SELECT word, position, eligible, weight FROM words")
+        for word, position, eligible, weight in rows:
+            expected = position != "name" and word.isalpha()
+            self.assertEqual(expected, bool(eligible), word)
+            self.assertIsNotNone(weight)
+
+
+class TestSentenceCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, "eng_news_2020_10K-sentences.txt")
+        with open(self.filename, "w", encoding="utf-8") as file:
+            file.write("1\tThe cat sleeps on the sofa.\n")
+            file.write("2\tA dog barks at the Cat!\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_iter_should_yield_the_same_tokenized_sentences_without_stop_words_on_each_pass(self):
+        # Arrange
+        corpus = data_processing.SentenceCorpus(self.filename, {"the", "on", "at"})
+
+        # Action
+        first = list(corpus)
+        second = list(corpus)
+
+        # Assert
+        self.assertEqual([["cat", "sleeps", "sofa"], ["dog", "barks", "cat"]], first)
+        self.assertEqual(first, second)
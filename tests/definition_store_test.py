@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import data_processing
+from definition_store import DefinitionStore, export_definitions
+from synthetic import generate_wiktextract
+from words import Word, WordIndex, Direction
+
+
+class TestDefinitionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        data_dir = self.tmp_dir.name
+        generate_wiktextract(data_dir, 30, ["en", "de"], n_senses=3, seed=2)
+        data_processing.create_database(data_dir)
+        data_processing.load_wiktextract(data_dir)
+        self.db_path = os.path.join(data_dir, "words.db")
+        self.store_path = os.path.join(data_dir, "definitions.store")
+
+        conn = sqlite3.connect(self.db_path)
+        self.definitions = {}
+        for word_id, definition in conn.execute("SELECT word_id, definition FROM definitions ORDER BY id"):
+            self.definitions.setdefault(word_id, []).append(definition)
+        conn.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_should_return_the_exported_definitions_of_every_word(self):
+        # Arrange
+        n_words = export_definitions(self.db_path, self.store_path, block_size=7)
+
+        # Action
+        store = DefinitionStore(self.store_path, cached_blocks=2)
+        result = {word_id: store.get(word_id) for word_id in self.definitions}
+
+        # Assert
+        self.assertEqual(len(self.definitions), n_words)
+        self.assertEqual(len(self.definitions), len(store))
+        self.assertEqual(self.definitions, result)
+        self.assertEqual([], store.get(-1))
+        self.assertNotIn(-1, store)
+        store.close()
+
+    def test_word_index_should_read_definitions_from_the_store_without_sql(self):
+        # Arrange
+        export_definitions(self.db_path, self.store_path)
+        index = WordIndex.__wrapped__(self.db_path, definition_store=self.store_path)
+        word_id = next(iter(self.definitions))
+        word = Word("", (0, 0), Direction.DOWN, word_id, "en")
+
+        # Action
+        definitions = index.get_definition(word)
+
+        # Assert
+        self.assertEqual(self.definitions[word_id], definitions)
+        self.assertEqual(0, index.queries)
+        index.definition_store.close()
+        index.conn.close()
@@ -0,0 +1,80 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from crossword import Crossword, CluesMode
+from export import PuzzleWriter, crossword_record, read_puzzles, record_grid
+from word_grid import WordGrid
+from words import Word, Direction
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        word_grid = WordGrid((5, 6))
+        words = [
+            Word("chat", (0, 1), Direction.ACROSS, 3, "fr"),
+            Word("hôte", (1, 1), Direction.DOWN, 8, "fr"),
+        ]
+        for word in words:
+            word_grid.place_word(word.position, word.direction, word)
+        self.crossword = Crossword(word_grid, words, "en", CluesMode.TRANSLATION, fetch_clues=False)
+        self.crossword.clues = [Word("cat", (0, 0), Direction.NONE, 12, "en"), None]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_crossword_record_should_flatten_grid_slots_and_clues(self):
+        # Action
+        record = crossword_record(self.crossword)
+
+        # Assert
+        self.assertEqual([5, 6], record["shape"])
+        self.assertEqual(30, len(record["grid"]))
+        self.assertEqual("chat", record["grid"][6:10])
+        self.assertEqual([[0, 1, Direction.ACROSS.value, 4], [1, 1, Direction.DOWN.value, 4]], record["slots"])
+        self.assertEqual([3, 8], record["word_ids"])
+        self.assertEqual([12, -1], record["clue_ids"])
+        self.assertEqual(["cat", None], record["clues"])
+
+    def test_crossword_record_should_keep_clue_ids_of_zero(self):
+        # Arrange
+        self.crossword.clues = [Word("cat", (0, 0), Direction.NONE, 0, "en"), None]
+
+        # Action
+        record = crossword_record(self.crossword)
+
+        # Assert
+        self.assertEqual([0, -1], record["clue_ids"])
+
+    def test_read_puzzles_should_lazily_read_back_both_formats(self):
+        for name in ["puzzles.jsonl.gz", "puzzles.bin.gz"]:
+            with self.subTest(name):
+                # Arrange
+                path = os.path.join(self.tmp_dir.name, name)
+                with PuzzleWriter(path) as writer:
+                    writer.write_all(self.crossword for _ in range(3))
+
+                # Action
+                records = read_puzzles(path)
+                first = next(records)
+                rest = list(records)
+
+                # Assert
+                self.assertEqual(name.endswith(".bin.gz"), writer.binary)
+                self.assertEqual(crossword_record(self.crossword), first)
+                self.assertEqual([first, first], rest)
+                self.assertTrue((self.crossword.word_grid.puzzle == record_grid(first).puzzle).all())
+                self.assertTrue((self.crossword.word_grid.state == record_grid(first).state).all())
+
+    def test_read_puzzles_should_reject_unknown_binary_versions(self):
+        # Arrange
+        path = os.path.join(self.tmp_dir.name, "puzzles.bin.gz")
+        with gzip.open(path, "wb") as file:
+            file.write(b"CLPZ\x09\x00\x00\x00")
+
+        # Action / Assert
+        with self.assertRaises(ValueError):
+            list(read_puzzles(path))
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from fingerprint import FingerprintIndex, grid_fingerprint, words_fingerprint
+from word_grid import WordGrid, Direction
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.word_grid = WordGrid((4, 5))
+        self.word_grid.place_word((0, 1), Direction.ACROSS, "house")
+        self.word_grid.place_word((2, 0), Direction.DOWN, "rust")
+
+    def test_grid_fingerprint_should_match_the_transposed_grid(self):
+        # Arrange
+        transposed = WordGrid((5, 4))
+        transposed.place_word((1, 0), Direction.DOWN, "house")
+        transposed.place_word((0, 2), Direction.ACROSS, "rust")
+        other = WordGrid((4, 5))
+        other.place_word((0, 2), Direction.ACROSS, "house")
+
+        # Action
+        fingerprint = grid_fingerprint(self.word_grid)
+
+        # Assert
+        self.assertEqual(fingerprint, grid_fingerprint(transposed))
+        self.word_grid.flip()
+        self.assertEqual(fingerprint, grid_fingerprint(self.word_grid))
+        self.assertNotEqual(fingerprint, grid_fingerprint(other))
+
+    def test_words_fingerprint_should_ignore_order_and_case(self):
+        # Action / Assert
+        self.assertEqual(words_fingerprint(["House", "rust"]), words_fingerprint(["rust", "house"]))
+        self.assertNotEqual(words_fingerprint(["house", "rust"]), words_fingerprint(["house", "dust"]))
+
+
+class TestFingerprintIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "fingerprints.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_add_should_reject_known_grids_and_word_sets_per_key_across_sessions(self):
+        # Arrange
+        index = FingerprintIndex(self.path)
+        index.add(b"grid", b"words", "8x8/en")
+        index.close()
+        index = FingerprintIndex(self.path)
+
+        # Action
+        same_grid = index.add(b"grid", b"other words", "8x8/en")
+        same_words = index.add(b"other grid", b"words", "8x8/en")
+        other_key = index.add(b"grid", b"words", "8x8/de")
+        new = index.add(b"new grid", b"new words", "8x8/en")
+
+        # Assert
+        self.assertEqual([False, False, True, True], [same_grid, same_words, other_key, new])
+        self.assertEqual(3, len(index))
+        self.assertEqual({"added": 2, "duplicates": 2, "dedup_rate": 0.5}, index.stats())
+        index.close()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from benchmark import build_synthetic_index
+from crossword import CrosswordStyle
+from parallel import SeedRacer, TiledGenerator, density, tile_origins
+from word_grid import ValidationMode, WordGrid
+
+# Word index shared by the worker pools of the module
+TMP_DIR = None
+
+
+def setUpModule():
+    global TMP_DIR
+    TMP_DIR = tempfile.TemporaryDirectory()
+    build_synthetic_index(TMP_DIR.name, 200, ["en"], themed=False, seed=2)
+
+
+def tearDownModule():
+    TMP_DIR.cleanup()
+
+
+class TestSeedRacer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.racer = SeedRacer(os.path.join(TMP_DIR.name, "words.db"), ["en"], CrosswordStyle.BRITISH, processes=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.racer.close()
+
+    def test_race_should_return_first_crossword_meeting_the_target(self):
+        # Action
+        crossword = self.racer.race((8, 8), "en", 6, seeds=range(4), target_words=3)
+
+        # Assert
+        self.assertGreaterEqual(len(crossword.words), 3)
+        self.assertEqual(len(crossword.words), len(crossword.clues))
+
+    def test_race_should_draw_fresh_seeds_unless_they_are_given(self):
+        # Action
+        fresh = [self.racer.race((8, 8), "en", 6) for _ in range(2)]
+        seeded = [self.racer.race((8, 8), "en", 6, seeds=[7]) for _ in range(2)]
+
+        # Assert
+        self.assertNotEqual(*[[str(word) for word in crossword.words] for crossword in fresh])
+        self.assertEqual(*[[str(word) for word in crossword.words] for crossword in seeded])
+
+    def test_race_should_return_best_truncated_crossword_when_time_budget_runs_out(self):
+        # Action
+        crossword = self.racer.race((8, 8), "en", 6, target_density=1.0, time_budget=0)
+
+        # Assert
+        self.assertTrue(crossword.truncated)
+        self.assertLess(density(crossword), 1.0)
+
+
+class TestTiledGenerator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.generator = TiledGenerator(os.path.join(TMP_DIR.name, "words.db"), ["en"], processes=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.generator.close()
+
+    def test_tile_origins_should_cover_the_grid_with_overlapping_tiles(self):
+        # Action / Assert
+        self.assertEqual([0, 9, 18], tile_origins(30, 12, 3))
+        self.assertEqual([0, 9, 18, 27], tile_origins(31, 12, 3))
+        self.assertEqual([0], tile_origins(8, 12, 3))
+
+    def test_generate_should_merge_tiles_into_a_valid_reproducible_grid(self):
+        # Action
+        crossword = self.generator.generate((20, 20), "en", 24, tile_shape=(8, 8), overlap=2, seed=5)
+        again = self.generator.generate((20, 20), "en", 24, tile_shape=(8, 8), overlap=2, seed=5)
+
+        # Assert
+        replay = WordGrid((20, 20))
+        for word in crossword.words:
+            self.assertTrue(replay.validate_word(word.position, word.direction, word, ValidationMode.HARD))
+            replay.add_word(word.position, word.direction, word)
+        self.assertTrue((replay.puzzle == crossword.word_grid.puzzle).all())
+        self.assertGreater(len(crossword.words), 4)
+        self.assertEqual(len(set(crossword.words)), len(crossword.words))
+        self.assertEqual(crossword.words, again.words)
+        self.assertEqual(len(crossword.words), len(crossword.clues))
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from benchmark import build_synthetic_index
+from crossword import CluesMode, ThemeMode
+from puzzle_pool import PuzzleKey, PuzzlePool, PuzzleStore
+
+
+class TestPuzzleStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = PuzzleStore(os.path.join(self.tmp_dir.name, "puzzles.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_pop_should_serve_puzzles_of_a_key_oldest_first_and_only_once(self):
+        # Arrange
+        self.store.put("8x8/en", {"words": ["cat"]})
+        self.store.put("8x8/de", {"words": ["Katze"]})
+        self.store.put("8x8/en", {"words": ["dog"]})
+
+        # Action
+        first = self.store.pop("8x8/en")
+        second = self.store.pop("8x8/en")
+        third = self.store.pop("8x8/en")
+
+        # Assert
+        self.assertEqual({"words": ["cat"]}, first)
+        self.assertEqual({"words": ["dog"]}, second)
+        self.assertIsNone(third)
+        self.assertEqual({"8x8/de": 1}, self.store.counts())
+
+
+class TestPuzzlePool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        data_dir = cls.tmp_dir.name
+        build_synthetic_index(data_dir, 100, ["en", "de"], themed=False, seed=4)
+        cls.db_path = os.path.join(data_dir, "words.db")
+        cls.pool_path = os.path.join(data_dir, "puzzles.db")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_get_should_serve_pre_generated_puzzles_and_refill_the_inventory(self):
+        # Arrange
+        key = PuzzleKey((6, 6), "en", "de", CluesMode.TRANSLATION)
+        pool = PuzzlePool(
+            {key: 2},
+            self.db_path,
+            self.pool_path,
+            n_words=4,
+            processes=1,
+            seed=0,
+            fingerprints=os.path.join(self.tmp_dir.name, "fingerprints.db"),
+        )
+
+        # Action
+        with pool:
+            full = pool.wait_full(timeout=60)
+            puzzle = pool.get(key)
+            refilled = pool.wait_full(timeout=60)
+            stats = pool.stats()[key.name]
+
+        # Assert
+        self.assertTrue(full)
+        self.assertTrue(refilled)
+        self.assertEqual(len(puzzle["words"]), len(puzzle["clues"]))
+        self.assertEqual(2, stats["inventory"])
+        self.assertEqual(1, stats["served"])
+        self.assertGreaterEqual(stats["refilled"], 3)
+        self.assertGreater(stats["refill_rate"], 0)
+        self.assertEqual(stats["duplicates"] / (stats["refilled"] + stats["duplicates"]), stats["dedup_rate"])
+
+    def test_wait_full_should_finish_once_a_key_that_cannot_be_generated_is_dropped(self):
+        # Arrange
+        key = PuzzleKey((6, 6), "en", "de", CluesMode.TRANSLATION)
+        impossible = PuzzleKey((6, 6), "en", theme="nothing", theme_mode=ThemeMode.CATEGORY)
+        pool = PuzzlePool(
+            {key: 1, impossible: 1},
+            self.db_path,
+            os.path.join(self.tmp_dir.name, "dropped.db"),
+            n_words=4,
+            processes=1,
+            seed=0,
+            max_attempts=3,
+        )
+
+        # Action
+        with pool:
+            full = pool.wait_full(timeout=60)
+            stats = pool.stats()
+
+        # Assert
+        self.assertFalse(full)
+        self.assertTrue(stats[impossible.name]["dropped"])
+        self.assertEqual(3, stats[impossible.name]["failed"])
+        self.assertEqual(0, stats[impossible.name]["inventory"])
+        self.assertFalse(stats[key.name]["dropped"])
+        self.assertEqual(1, stats[key.name]["inventory"])
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+
+from slot_scoring import BLOCKED_SCORE, SlotScorer
+from word_grid import WordGrid, Direction
+
+
+class TestSlotScorer(unittest.TestCase):
+
+    def test_scores_should_favor_slots_crossing_placed_words(self):
+        # Arrange
+        word_grid = WordGrid((6, 6))
+        word_grid.add_word((1, 2), Direction.ACROSS, "house")
+
+        # Action
+        scorer = SlotScorer(word_grid, window=3, crossing_weight=4, density_weight=0)
+
+        # Assert
+        down = scorer.weights(Direction.DOWN, [(2, 0), (2, 2), (2, 3), (0, 4), (2, 5)])
+        self.assertEqual([5, 5, BLOCKED_SCORE, 1, 1], down.tolist())
+        across = scorer.weights(Direction.ACROSS, [(1, 2), (3, 2), (0, 0)])
+        self.assertEqual([BLOCKED_SCORE, BLOCKED_SCORE, 1], across.tolist())
+
+    def test_update_should_match_scoring_the_whole_grid_again(self):
+        # Arrange
+        word_grid = WordGrid((8, 10))
+        scorer = SlotScorer(word_grid)
+        words = [
+            ((1, 2), Direction.ACROSS, "house"),
+            ((3, 0), Direction.DOWN, "crust"),
+            ((0, 6), Direction.ACROSS, "garden"),
+            ((9, 1), Direction.DOWN, "pond"),
+        ]
+
+        # Action
+        for position, direction, word in words:
+            word_grid.add_word(position, direction, word)
+            scorer.update(position, direction, len(word))
+
+        # Assert
+        expected = SlotScorer(word_grid)
+        for direction in [Direction.DOWN, Direction.ACROSS]:
+            np.testing.assert_array_equal(expected.scores[direction], scorer.scores[direction])
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from templates import Template, TemplateBank, generate_template
+from word_grid import WordGrid, Direction
+
+
+class TestTemplate(unittest.TestCase):
+
+    def test_generate_template_should_place_valid_slots(self):
+        # Arrange
+        rng = np.random.default_rng(4)
+
+        # Action
+        template = generate_template((8, 8), 10, rng=rng)
+
+        # Assert
+        word_grid = WordGrid((8, 8))
+        self.assertLessEqual(len(template), 10)
+        self.assertTrue(all(word_grid.add_word(move.position, move.direction, move) for move in template.moves()))
+        self.assertTrue(((word_grid.state != 0) == (template.state() != 0)).all())
+
+    def test_density_should_be_the_fraction_of_covered_cells_crossed_by_two_slots(self):
+        # Arrange
+        slots = np.array([[0, 0, Direction.DOWN.value, 4], [0, 0, Direction.ACROSS.value, 5]], dtype=np.uint8)
+
+        # Action
+        template = Template((5, 5), slots)
+
+        # Assert
+        self.assertEqual(1 / 8, template.density)
+
+
+class TestTemplateBank(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.bank = TemplateBank(os.path.join(self.tmp_dir.name, "templates.db"))
+
+    def tearDown(self):
+        self.bank.close()
+        self.tmp_dir.cleanup()
+
+    def test_pick_should_return_a_template_of_the_shape_slot_count_and_density(self):
+        # Arrange
+        rng = np.random.default_rng(2)
+        templates = [generate_template((8, 8), 6, rng=rng) for _ in range(20)]
+        template = templates[0]
+
+        # Action
+        added = self.bank.add(templates + templates[:5])
+        result = self.bank.pick((8, 8), len(template), template.density, rng)
+        missing = self.bank.pick((9, 9), len(template))
+
+        # Assert
+        self.assertEqual(20, added)
+        self.assertEqual(20, len(self.bank))
+        self.assertEqual(len(template), len(result))
+        self.assertEqual(int(template.density * 10), int(result.density * 10))
+        self.assertIsNone(missing)
@@ -266,5 +266,21 @@ class TestWordGrid(unittest.TestCase):
         self.assertTrue(word, ''.join(grid.puzzle[0:len(word), 0]))
         self.assertTrue(word, ''.join(grid.puzzle[0, 0:len(word)]))
 
+    def test_place_word_should_write_the_same_cells_as_add_word(self):
+        # Arrange
+        shape = (6, 8)
+        added = WordGrid(shape)
+        placed = WordGrid(shape)
+        added.add_word((1, 2), Direction.ACROSS, "great")
+        added.add_word((3, 0), Direction.DOWN, "Bread")
+
+        # Action
+        placed.place_word((1, 2), Direction.ACROSS, "great")
+        placed.place_word((3, 0), Direction.DOWN, "Bread")
+
+        # Assert
+        self.assertTrue((added.puzzle == placed.puzzle).all())
+        self.assertTrue((added.state == placed.state).all())
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,236 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import pickle
+import tempfile
+import unittest
+
+import pandas as pd
+
+from benchmark import build_synthetic_index
+from words import ClueCache, Word, WordIndex, Direction
+
+
+class TestWord(unittest.TestCase):
+
+    def test_from_row_should_keep_id_text_and_placement_only(self):
+        # Arrange
+        row = pd.Series({"id": 7, "word": "cat", "language_code": "en", "frequency": 309.0})
+
+        # Action
+        word = Word.from_row(row, (1, 2), Direction.DOWN)
+
+        # Assert
+        self.assertEqual("cat", word)
+        self.assertEqual(7, word.id)
+        self.assertEqual("en", word.language_code)
+        self.assertEqual((1, 2), word.position)
+        self.assertEqual(Direction.DOWN, word.direction)
+        self.assertFalse(hasattr(word, "__dict__"))
+
+    def test_pickle_should_preserve_placement(self):
+        # Arrange
+        word = Word("Hund", (3, 0), Direction.ACROSS, 4, "de")
+
+        # Action
+        result = pickle.loads(pickle.dumps(word))
+
+        # Assert
+        self.assertIsInstance(result, Word)
+        self.assertEqual(word, result)
+        self.assertEqual(
+            (word.id, word.language_code, word.position, word.direction),
+            (result.id, result.language_code, result.position, result.direction),
+        )
+
+
+class TestClueCache(unittest.TestCase):
+
+    def test_put_should_evict_least_recently_used_entries_over_maxsize(self):
+        # Arrange
+        cache = ClueCache(maxsize=2)
+        cache.put((1, "definition", "en"), ("a",))
+        cache.put((2, "definition", "en"), ("b",))
+        cache.get((1, "definition", "en"))
+
+        # Action
+        cache.put((3, "definition", "en"), ("c",))
+
+        # Assert
+        self.assertEqual(("a",), cache.get((1, "definition", "en")))
+        self.assertIsNone(cache.get((2, "definition", "en")))
+        self.assertEqual(1, cache.stats()["evictions"])
+
+    def test_get_should_miss_expired_entries(self):
+        # Arrange
+        cache = ClueCache(ttl=-1)
+        cache.put((1, "synonym", "en"), ())
+
+        # Action
+        result = cache.get((1, "synonym", "en"))
+
+        # Assert
+        self.assertIsNone(result)
+        self.assertEqual({"size": 0, "hits": 0, "misses": 1, "evictions": 1, "hit_rate": 0.0}, cache.stats())
+
+
+class TestWordIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        data_dir = cls.tmp_dir.name
+        build_synthetic_index(data_dir, 40, ["en", "de", "fr"], themed=False, seed=5)
+        cls.db_path = os.path.join(data_dir, "words.db")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        # Bypass the singleton to get a fresh index per test
+        self.index = WordIndex.__wrapped__(self.db_path)
+
+    def tearDown(self):
+        self.index.conn.close()
+        self.index.connections.close()
+
+    def test_get_data_should_only_load_requested_languages(self):
+        # Action
+        data = self.index.get_data(["en"], eligible_only=True)
+
+        # Assert
+        self.assertEqual(["de", "en", "fr"], self.index.languages)
+        self.assertEqual(["en"], self.index.resident_languages(eligible_only=True))
+        self.assertEqual([], self.index.resident_languages())
+        self.assertTrue((data.language_code == "en").all())
+        self.assertTrue(data.eligible.all())
+        self.assertTrue(data.attrs["eligible"])
+
+    def test_get_data_should_use_compact_dtypes(self):
+        # Action
+        data = self.index.get_data(["en", "de"])
+
+        # Assert
+        self.assertEqual("int32", data.id.dtype)
+        self.assertEqual("float32", data.frequency.dtype)
+        self.assertIsInstance(data.language_code.dtype, pd.CategoricalDtype)
+        self.assertIsInstance(data.position.dtype, pd.CategoricalDtype)
+
+    def test_get_word_data_should_load_the_row_of_a_word_id(self):
+        # Arrange
+        row = self.index.get_data(["fr"]).iloc[3]
+        index = WordIndex.__wrapped__(self.db_path)
+
+        # Action
+        result = index.get_word_data(int(row.id), "fr")
+
+        # Assert
+        self.assertEqual(row.word, result.word)
+        self.assertEqual(["fr"], index.resident_languages())
+        index.conn.close()
+
+    def test_get_word_data_should_use_a_resident_eligible_shard_before_loading_the_full_one(self):
+        # Arrange
+        row = self.index.get_data(["fr"], eligible_only=True).iloc[0]
+
+        # Action
+        result = self.index.get_word_data(int(row.id), "fr")
+
+        # Assert
+        self.assertEqual(row.word, result.word)
+        self.assertEqual([], self.index.resident_languages())
+        self.assertEqual(["fr"], self.index.resident_languages(eligible_only=True))
+
+    def test_get_translation_should_return_every_translation_counted_in_the_index(self):
+        # Arrange
+        data = self.index.get_data(["en"])
+        row = data[data.num_de > 0].iloc[0]
+        word = Word.from_row(row, (0, 0), Direction.DOWN)
+        queries = self.index.queries
+
+        # Action
+        translations = self.index.get_translation(word, "de")
+        self.index.get_translation(word, "de")
+
+        # Assert
+        self.assertEqual(row.num_de, len(translations))
+        self.assertTrue(all(translation.language_code == "de" for translation in translations))
+        self.assertEqual(queries + 1, self.index.queries)
+
+    def test_get_translation_should_return_empty_list_when_word_has_no_translation(self):
+        # Arrange
+        word = Word("unknown", (0, 0), Direction.DOWN, -1, "en")
+
+        # Action
+        translations = self.index.get_translation(word, "fr")
+
+        # Assert
+        self.assertEqual([], translations)
+
+    def test_get_category_words_should_match_category_names_or_prefixes(self):
+        # Arrange
+        conn = self.index.conn
+        expected = {
+            row[0] for row in conn.execute(
+                "SELECT word_id FROM word_categories JOIN categories ON category_id = id WHERE name = 'Topic 0'"
+            )
+        }
+        expected_prefix = {
+            row[0] for row in conn.execute(
+                "SELECT word_id FROM word_categories JOIN categories ON category_id = id WHERE name LIKE 'Topic 0%'"
+            )
+        }
+
+        # Action
+        words = self.index.get_category_words("topic 0")
+        prefix_words = self.index.get_category_words("Topic 0", prefix=True)
+        missing_words = self.index.get_category_words("Unknown")
+
+        # Assert
+        self.assertEqual(expected, set(words))
+        self.assertEqual(expected_prefix, set(prefix_words))
+        self.assertEqual(0, len(missing_words))
+
+    def test_lazy_loads_should_run_in_threads_other_than_the_constructing_one(self):
+        # Action
+        with ThreadPoolExecutor(1) as executor:
+            data = executor.submit(self.index.get_data, ["de"]).result()
+            category_index = executor.submit(self.index.get_category_index).result()
+
+        # Assert
+        self.assertGreater(len(data), 0)
+        self.assertEqual(["de"], self.index.resident_languages())
+        self.assertGreater(len(category_index[2]), 0)
+
+    def test_get_definition_should_serve_repeated_lookups_from_the_clue_cache(self):
+        # Arrange
+        row = self.index.get_data(["de"]).iloc[0]
+        word = Word.from_row(row, (0, 0), Direction.DOWN)
+        definitions = self.index.get_definition(word)
+        queries = self.index.queries
+
+        # Action
+        result = self.index.get_definition(word)
+
+        # Assert
+        self.assertEqual(definitions, result)
+        self.assertEqual(row.num_definitions, len(result))
+        self.assertEqual(queries, self.index.queries)
+        self.assertEqual(1, self.index.clue_cache.stats()["hits"])
+
+    def test_prewarm_should_cache_clues_of_the_most_frequent_words(self):
+        # Arrange
+        data = self.index.get_data(["en"], eligible_only=True)
+        row = data.sort_values("frequency", ascending=False).iloc[0]
+        word = Word.from_row(row, (0, 0), Direction.ACROSS)
+
+        # Action
+        self.index.prewarm(["en"], top_n=5, translations_to=["fr"])
+        queries = self.index.queries
+        self.index.get_definition(word)
+        self.index.get_synonym(word)
+        self.index.get_translation(word, "fr")
+
+        # Assert
+        self.assertEqual(queries, self.index.queries)
+        self.assertEqual(3, self.index.clue_cache.stats()["hits"])